@@ -43,6 +43,130 @@
 #
 # if fps is omitted the default is 30
 #
+# More than two feeds (e.g. satellite stations on one wall display), laid out automatically:
+# e.g. python Derby2in1Video.py video0 video2 video4 video6 30 1280 720
+#
+# Several cabinets from one process (one window per device group, one per monitor when available):
+# e.g. python Derby2in1Video.py --cabinets=video0,video2:video4,video6 30 1280 720
+#
+# Feeds may also be URIs, e.g. to run without capture cards (build machines, soak tests):
+#   v4l2:///dev/video0                     a capture card (same as video0)
+#   file:///path/clip.mjpeg[?fps=60]       an MJPEG stream (concatenated JPEGs, e.g. a B replay), looped at fps
+#   file:///path/feed1.mkv                 a --record recording, played once
+#                                          both take ?timing=original (default: the recorded frame
+#                                          timing) or ?timing=fast (as fast as decoding allows)
+#   test://ball[?kb=250&frames=60&motion=sweep&quality=85]
+#                                          synthetic MJPEG: a loop of JPEGs encoded once from a
+#                                          videotestsrc pattern (ball, snow = worst case, smpte =
+#                                          static; motion = wavy|sweep|hsweep for ball) at the
+#                                          capture size, quality or target KB per frame
+#   shm:///tmp/socket[?format=I420|jpeg]   frames from a shmsink at the capture size and fps
+# e.g. python Derby2in1Video.py test://ball?kb=250 test://snow 60 1920 1080
+#
+# Importable: nothing runs on import. CompositorPipeline builds and runs the compositing pipeline
+# headless (fakesink/appsink) for benchmarks and tests; the window is a front-end over it.
+#
+# Options (may appear anywhere on the command line)
+# --sink=gtksink|glimagesink|ximagesink   force a video sink instead of the remembered/default one
+# --bench-sinks                          measure present latency and CPU of every available sink,
+#                                        remember the cheapest and start with it
+# --prescale[=threads]                   scale each feed to its pad size on the feed's own streaming
+#                                        thread (multi-threaded videoscale) so the compositor only blits
+# --bench-prescale                       print composited throughput with and without --prescale and exit
+# --align=N                              snap pad widths/offsets to multiples of N pixels (e.g. 16)
+# --scale-method=nearest|bilinear|cubic|lanczos
+#                                        pad scaling filter; remembered for this machine
+# --bench-scale                          print per-frame composition cost of each scaling method at the
+#                                        window and monitor sizes, then exit
+# --io-mode=auto|dmabuf|dmabuf-import|userptr|mmap
+#                                        v4l2 buffer mode. auto (default) probes dmabuf, dmabuf-import and
+#                                        userptr per device, keeps the first one that delivers frames and
+#                                        falls back to mmap; the result is remembered per card and mode
+# --capture-format=auto|mjpeg|raw        auto (default) captures raw YUYV instead of MJPEG when the mode
+#                                        exists, fits the USB link and costs less CPU than jpegdec
+# --reprobe                              ignore remembered capture probes and measure again
+# --layout=auto|row|grid                 arrangement of the feeds; auto = row for two feeds, grid above
+# --cropN=left,right[,top,bottom]        crop of feed N (1-based), e.g. --crop3=40,53
+# --geomN=x,y,w,h                        place feed N at fractions of the window, e.g. --geom3=0.75,0,0.25,0.25
+# --bench-feeds                          print composited fps for 2..8 synthetic feeds and exit
+# --bench-replay                         play the file:// feeds (recordings of real cabinets) once through
+#                                        the compositor without dropping frames, print fps and CPU/frame,
+#                                        append them to --bench-csv (default ~/segadoc2in1-bench.csv)
+#                                        with this script's version and compare with the last other
+#                                        version that ran the same files and settings
+# --cabinets=a,b:c,d                     run one independent pipeline and window per device group
+# --metrics[=seconds]                    log per-pipeline fps, drops and errors (on by default with --cabinets)
+# --affinity=feed1:1,feed2:2,comp:3      pin streaming threads to CPUs: feedN = capture/decode/queue threads
+#                                        of feed N, comp = compositor + sink, main = GTK main thread;
+#                                        ranges like comp:2-3 are allowed
+# --rt-priority=N                        run the pinned streaming threads SCHED_FIFO at priority N
+#                                        (needs CAP_SYS_NICE or an rtprio limit)
+# --jitter                               collect frame interval jitter histograms (logged with the metrics
+#                                        and when a window closes)
+# --isolate                              capture + decode each feed in its own gst-launch-1.0 worker process
+#                                        that hands frames over through shared memory (shmsink/shmsrc);
+#                                        a stalled or dead worker is killed and respawned, the display stays
+# --standby                              keep a second, pre-built pipeline in READY and swap it in on R or
+#                                        on a pipeline error instead of rebuilding (R then keeps the
+#                                        current resolution)
+# --startup-profile                      print when each startup phase ran and how long it took once the
+#                                        first frame is on screen (time-to-first-frame is always logged)
+# --warm-registry                        one-shot setup: link just the plugins this script uses into
+#                                        ~/.cache/segadoc2in1, build their registry, time Gst.init with
+#                                        all plugins vs the cached set and exit; later starts load only
+#                                        the cached set
+# --full-registry                        load every installed plugin for this run despite the cache
+# --record=DIR                           record each MJPEG feed's original JPEG packets (tee in front of
+#                                        jpegdec, no re-encode) to DIR/[cabinet-]feedN-<time>.mkv through
+#                                        a leaky queue that never holds up the display; throughput and
+#                                        dropped packets are logged with the metrics and on exit
+# --replay[=seconds]                     keep the last 20 s (default) of each MJPEG feed's JPEG frames in
+#                                        memory: B writes them to disk, P shows them as a picture-in-picture
+# --replay-mb=N                          memory cap of each feed's replay ring (default 192 MB)
+# --replay-dir=DIR                       where B writes replays (default: --record dir or ~/segadoc2in1-replays)
+# --replay-pip=N                         feed shown by P (default 1)
+# --stream=udp://host:port|srt://host:port
+#                                        also send the composited picture over the network: H.264 from
+#                                        x264enc (zerolatency, ultrafast) as RTP over UDP, or MPEG-TS over
+#                                        SRT, on a leaky branch so a slow network never holds up the display;
+#                                        encode time and bitrate are logged with the metrics and on exit
+# --stream-kbps=N                        stream bitrate (default 4000)
+# --stream-size=WxH                      stream picture size (default 1280x720)
+#                                        with --cabinets, cabinet N streams to port+N-1
+# --thumbnail[=PATH]                     keep a small JPEG of the composite up to date for a dashboard
+#                                        (default /dev/shm/segadoc2in1[-cabinetN].jpg, replaced atomically);
+#                                        frames are let through once per interval before they are scaled
+#                                        and encoded; T turns it off and on
+# --thumbnail-width=N                    thumbnail width (default 320, height keeps the aspect ratio)
+# --thumbnail-every=seconds              thumbnail interval (default 1)
+# --screenshot-dir=DIR                   where S saves the composite and every raw feed (default
+#                                        ~/segadoc2in1-screenshots); encoded on a worker thread
+# --screenshot-format=png|jpeg           screenshot format (default png)
+# --shm-out[=PATH]                       publish the composited frames for other local processes in a
+#                                        shared memory ring (default /dev/shm/segadoc2in1-out[-cabinetN])
+#                                        with a sequence number, pts and time per frame; read it with
+#                                        ShmFrameReader.py, no decoding or compositing again
+# --shm-out-size=WxH                     ring frame size (default 1280x720)
+# --shm-out-format=BGRx|RGBx|I420|GRAY8  ring pixel format (default BGRx)
+# --shm-out-slots=N                      frames the ring holds (default 4)
+# --no-window                            run without a window or GTK, so no display is needed (e.g.
+#                                        --shm-out only on a headless box); Ctrl+C or SIGTERM stops
+# --bench-shm-out                        print frames/s and copy cost of publishing two synthetic feeds
+#                                        into the ring, then exit
+# --tap=plugin.py[,plugin2.py]           analytics plugins: each module's on_frame(frame) gets frames of
+#                                        SOURCE (composite, feed1, feed2, ...) every EVERY seconds on its
+#                                        own thread, as read-only NumPy views over the decoded buffer
+# --tap-source=composite|feedN           override SOURCE of every plugin
+# --tap-every=seconds                    override EVERY of every plugin
+# --hud[=hidden]                         stats overlay (H toggles it), shown at start unless hidden: fps,
+#                                        drops and latency per feed and CPU, redrawn once a second; without
+#                                        it the compositor gets no overlay pad for it
+# --damage                               skip work on unchanged pictures (menus, attract mode): a JPEG identical
+#                                        to the feed's previous one is not decoded, and a composite with no new
+#                                        input is not presented; skipped work and CPU saved are logged
+# --bench-damage                         print CPU (and power where RAPL is readable) of static and half-static
+#                                        synthetic feeds with and without --damage, then exit
+#
 #
 #------------------------------------------------------------------------------------------------------------------
 # Revision History
@@ -56,16 +180,41 @@
 #------------------------------------------------------------------------------------------------------------------
 #########################################################################################################
 
-import gi
 import sys 
 import os
 import time
+import json
+import re
+import bisect
+import shlex
+import signal
+import atexit
+import subprocess
+import threading
+import urllib.parse
+import hashlib
+import csv
+import mmap
+import struct
+import importlib.util
+import zlib
+
+T0 = time.perf_counter() # script start: the startup profile and time-to-first-frame count from here
 
-gi.require_version('Gtk', '3.0')
-gi.require_version('Gst', '1.0')
-gi.require_version('GstVideo', '1.0')
-
-from gi.repository import Gtk, Gst, GdkX11, Gdk
+try:
+    import gi
+    gi.require_version('Gst', '1.0')
+    gi.require_version('GstVideo', '1.0')
+    from gi.repository import Gst, GstVideo, GLib
+except (ImportError, ValueError): # the layout, settings and ring helpers work without GStreamer
+    gi = Gst = GstVideo = GLib = None
+Gtk = Gdk = GdkX11 = None # import_gtk(): importing Gtk opens the display, so only windows do
+
+def import_gtk():
+    global Gtk, Gdk, GdkX11
+    if Gtk is None:
+        gi.require_version('Gtk', '3.0')
+        from gi.repository import Gtk, Gdk, GdkX11
 
 # -------- Config Defaults --------
 fps=30
@@ -76,6 +225,78 @@ WINDOW_X = 0
 WINDOW_Y = 50
 res1 = 1920 # default is 1920
 res2 = 1080 # default is 1080
+SETTINGS_FILE = os.path.expanduser("~/.segadoc2in1.json") # remembered choices (sink, ...)
+SINK_CANDIDATES = ("gtksink", "glimagesink", "ximagesink") # preference order when nothing is remembered
+BENCH_FRAMES = 300 # frames measured per benchmark run
+BENCH_WARMUP = 30  # frames ignored at the start of a benchmark run
+BENCH_CSV = os.path.expanduser("~/segadoc2in1-bench.csv") # --bench-replay results, one row per run
+BENCH_REPLAY_RUNS = 3 # --bench-replay passes per file set (median by fps)
+BENCH_REPLAY_TIMEOUT = 900 # seconds one pass may take
+PRESCALE_THREADS = 2 # videoscale threads per feed when --prescale is given without a value
+IO_MODE_PREFERENCE = ("dmabuf", "dmabuf-import", "userptr", "mmap") # zero-copy first, mmap last
+PROBE_FRAMES = 30  # frames a capture probe must deliver
+PROBE_TIMEOUT = 5  # seconds before a capture probe counts as failed
+DEFAULT_CROPS = [(40, 53, 0, 0), (44, 52, 0, 0)] # left, right, top, bottom of feed 1, 2; further feeds uncropped
+METRICS_INTERVAL = 60 # seconds between metrics log lines
+WORKER_STALL_TIMEOUT = 3 # seconds without frames before a capture worker is respawned
+WORKER_START_TIMEOUT = 5 # seconds to wait for a worker's shared memory socket
+WORKER_SHM_FRAMES = 6    # decoded frames the shared memory area of a worker can hold
+STATE_TIMEOUT = 5 # seconds a pipeline state change may take before it is abandoned
+SWITCH_TARGET_MS = 250 # standby switch-over target, trigger to first frame at the sink
+STANDBY_RELEASE_TIMEOUT = 1 # seconds to wait for the old pipeline to release the cards
+UI_HEARTBEAT_MS = 50 # main loop heartbeat used to measure UI stalls (with --metrics)
+JITTER_BUCKETS_MS = (0.5, 1, 2, 4, 8, 16, 33) # upper edges of the jitter histogram buckets
+USB_RAW_BUDGET = 0.4 # share of the USB link raw isochronous video may use (USB2: ~24 of 60 MB/s)
+PLUGIN_CACHE_DIR = os.path.expanduser("~/.cache/segadoc2in1") # --warm-registry: plugin links + registry
+REGISTRY_ELEMENTS = ("v4l2src", "capsfilter", "jpegdec", "videocrop", "videoscale", "videoconvert", "queue",
+                     "compositor", "shmsink", "shmsrc", "fakesink", "videotestsrc", "appsrc", "appsink",
+                     "jpegenc", "jpegparse", "identity", "tee", "matroskamux",
+                     "filesink", "filesrc", "matroskademux", "x264enc", "h264parse", "rtph264pay", "udpsink",
+                     "mpegtsmux", "srtsink", "pngenc") + SINK_CANDIDATES
+RECORD_QUEUE_BUFFERS = 2 # packets a recording may fall behind the disk; they are the card's own
+                         # buffers, so this stays well under the v4l2 pool (usually 4)
+RECORD_FINISH_TIMEOUT = 2 # seconds a recording gets to write its index when its pipeline stops
+REPLAY_SECONDS = 20 # --replay default length
+REPLAY_MAX_MB = 192 # --replay-mb default, per feed (1080p30 MJPEG is ~6 MB/s)
+REPLAY_PIP_FRACTION = 3 # the replay picture-in-picture is 1/3 of the window wide and high
+REPLAY_PIP_MARGIN = 16
+STREAM_KBPS = 4000 # --stream default bitrate
+STREAM_KEYFRAME_FRAMES = 30 # keyframe interval: a receiver joining late waits at most this long
+STREAM_ENCODER_THREADS = 2 # x264enc threads; the rest of the cores keep decoding the feeds
+THUMB_WIDTH = 320 # --thumbnail-width default
+THUMB_INTERVAL = 1.0 # --thumbnail-every default, seconds
+THUMB_QUALITY = 80
+SHM_DIR = "/dev/shm" # tmpfs: thumbnails and the output ring never touch the SD card
+SCREENSHOT_FEED_TIMEOUT = 1 # seconds S waits for each feed's next frame
+SCREENSHOT_FORMATS = {"png": "image/png", "jpeg": "image/jpeg"}
+SHM_OUT_SLOTS = 4 # --shm-out-slots default: frames a reader may fall behind before it misses some
+SHM_OUT_FORMATS = ("BGRx", "RGBx", "I420", "GRAY8")
+# Output ring layout, shared with ShmFrameReader.py: header, then slots of SLOT header + frame.
+SHM_RING_MAGIC = b"SDOCRNG1"
+SHM_RING_HEADER = struct.Struct("<8sIIIIII16sI4I4I") # magic, version, header size, slots, slot size,
+                                                     # width, height, format, frame size, strides, offsets
+SHM_RING_LATEST = 128 # u64: sequence number of the newest complete frame
+SHM_RING_DATA = 192   # first slot
+SHM_SLOT = struct.Struct("<QQQI") # seq (0 while written), pts ns, CLOCK_MONOTONIC ns when published, bytes
+SHM_SLOT_DATA = 64    # frame data offset inside a slot
+DAMAGE_BENCH_SECONDS = 10 # --bench-damage measuring time per run
+RAPL_ENERGY = "/sys/class/powercap/intel-rapl:0/energy_uj" # x86 package energy, if readable
+HUD_INTERVAL_MS = 1000 # stats overlay redraw
+HUD_WIDTH = 360
+HUD_FONT = 14
+HUD_LINE = 18
+HUD_MARGIN = 16
+TAP_EVERY = 1.0 # seconds between frames handed to an analytics plugin unless it sets EVERY
+SYNTHETIC_FRAMES = 60 # frames in a test:// loop
+SYNTHETIC_QUALITIES = (95, 85, 75, 60, 45, 30, 15) # jpegenc qualities tried to hit a test:// kb= target
+REGISTRY_TIMING_RUNS = 3 # Gst.init runs per warm measurement (median)
+# name: (compositor converter resampler method, videoscale method)
+SCALE_METHODS = {
+    "nearest":  ("nearest", "nearest-neighbour"),
+    "bilinear": ("linear", "bilinear"),
+    "cubic":    ("cubic", "catrom"),
+    "lanczos":  ("lanczos", "lanczos"),
+}
 
 # ------------------------
 
@@ -88,169 +309,2885 @@ def log(message):
     print(msg, flush=True)
 
 
+# ---- Startup profile ----
+def process_age():
+    # seconds since this process was exec'd (interpreter start and imports included), from /proc
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0]) - started
+    except Exception:
+        return None
+
+class StartupProfile:
+    # Startup phases as (start, end) spans after T0. Phases on the helper threads overlap
+    # the main thread ones, so the report lists where each ran rather than a plain sum.
+    def __init__(self):
+        age = process_age()
+        self.before_t0 = age - (time.perf_counter() - T0) if age is not None else None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def mark(self, phase, start):
+        with self.lock:
+            self.spans.append((start - T0, time.perf_counter() - T0, phase))
+
+    def since_launch(self, t):
+        # perf_counter() value -> ms since the process was started
+        return ((self.before_t0 or 0.0) + t - T0) * 1000.0
+
+    def report(self):
+        lines = ["⏱️ Startup profile (ms after script start):"]
+        if self.before_t0 is not None:
+            lines.append(f"   {'interpreter + python imports':36s} {-self.before_t0 * 1000:7.0f} → {0:6.0f}")
+        with self.lock:
+            for start, end, phase in sorted(self.spans):
+                lines.append(f"   {phase:36s} {start * 1000:7.0f} → {end * 1000:6.0f}  ({(end - start) * 1000:5.0f} ms)")
+        return "\n".join(lines)
+
+startup = StartupProfile()
+
+
+# ---- Remembered settings ----
+def load_settings():
+    try:
+        with open(SETTINGS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_settings(settings):
+    tmp = SETTINGS_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(settings, f, indent=2, sort_keys=True)
+    os.replace(tmp, SETTINGS_FILE)
+
+
+# ---- Plugin registry cache (--warm-registry) ----
+def plugin_cache_env():
+    # GStreamer only scans the linked plugins and keeps their registry apart from the system one
+    return {"GST_PLUGIN_SYSTEM_PATH_1_0": os.path.join(PLUGIN_CACHE_DIR, "plugins"),
+            "GST_PLUGIN_PATH_1_0": "",
+            "GST_REGISTRY_1_0": os.path.join(PLUGIN_CACHE_DIR, "registry.bin")}
+
+def plugin_fingerprint(paths):
+    try:
+        return {p: [os.stat(p).st_size, int(os.stat(p).st_mtime)] for p in paths}
+    except OSError:
+        return None
+
+def use_plugin_cache(settings):
+    # Before Gst.init. Skipped when the cache misses an element this version creates; when a
+    # package update replaced one of the plugins the small cached set is rescanned.
+    cache = settings.get("plugin_cache")
+    if not cache:
+        return False
+    if set(REGISTRY_ELEMENTS) - set(cache["elements"]):
+        log("⚠️ Plugin cache is older than this script; loading all plugins (run --warm-registry again).")
+        return False
+    env = plugin_cache_env()
+    if plugin_fingerprint(cache["plugins"]) == cache["fingerprint"]:
+        env["GST_REGISTRY_UPDATE"] = "no"
+    else:
+        log("⚠️ Plugins changed since --warm-registry; rescanning the cached set (run it again to skip this).")
+    os.environ.update(env)
+    log(f"🧩 Loading {len(cache['plugins'])} cached plugins only (--full-registry loads all).")
+    return True
+
+GST_INIT_TIMER = """
+import sys, time, gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+t = time.perf_counter()
+Gst.init(None)
+ms = (time.perf_counter() - t) * 1000
+n = len(Gst.Registry.get().get_feature_list(Gst.ElementFactory))
+print(ms, n, ",".join(e for e in sys.argv[1:] if not Gst.ElementFactory.find(e)) or "-")
+"""
+
+def time_gst_init(env, runs=1):
+    # Gst.init in fresh interpreters -> (median ms, element factories, elements not found)
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", GST_INIT_TIMER] + list(REGISTRY_ELEMENTS),
+                             env=dict(os.environ, **env), capture_output=True, text=True, timeout=600)
+        ms, n, missing = out.stdout.split()
+        results.append((float(ms), int(n), [] if missing == "-" else missing.split(",")))
+    return sorted(results)[len(results) // 2]
+
+def warm_registry(settings):
+    # Link the plugins behind REGISTRY_ELEMENTS (and the elements their bins create, e.g.
+    # glimagesink) into the cache, build a registry of just those and compare Gst.init times.
+    plugins, missing = set(), []
+    for name in REGISTRY_ELEMENTS:
+        factory = Gst.ElementFactory.find(name)
+        if not factory:
+            missing.append(name)
+            continue
+        element = factory.create(None)
+        children = list(element.iterate_recurse()) if isinstance(element, Gst.Bin) else []
+        for e in [element] + children:
+            plugin = e.get_factory().get_plugin() if e.get_factory() else None
+            if plugin and plugin.get_filename():
+                plugins.add(os.path.realpath(plugin.get_filename()))
+    if missing:
+        log(f"⚠️ Not installed, left out: {', '.join(missing)}")
+
+    env = plugin_cache_env()
+    plugin_dir = env["GST_PLUGIN_SYSTEM_PATH_1_0"]
+    os.makedirs(plugin_dir, exist_ok=True)
+    for f in os.listdir(plugin_dir):
+        os.remove(os.path.join(plugin_dir, f))
+    for path in sorted(plugins):
+        os.symlink(path, os.path.join(plugin_dir, os.path.basename(path)))
+    try: os.remove(env["GST_REGISTRY_1_0"])
+    except OSError: pass
+    log(f"🧩 Linked {len(plugins)} plugins into {plugin_dir}")
+
+    cold = os.path.join(PLUGIN_CACHE_DIR, "cold-scan.bin") # a fresh registry = the first start after an update
+    full_cold = time_gst_init({"GST_REGISTRY_1_0": cold})
+    try: os.remove(cold)
+    except OSError: pass
+    full_warm = time_gst_init({}, REGISTRY_TIMING_RUNS)
+    cached_cold = time_gst_init(env) # builds registry.bin
+    cached_warm = time_gst_init(dict(env, GST_REGISTRY_UPDATE="no"), REGISTRY_TIMING_RUNS)
+    lost = set(cached_warm[2]) - set(full_warm[2])
+    if lost:
+        log(f"❌ The cached set lacks {', '.join(sorted(lost))}; not enabling it.")
+        return
+    log(f"⏱️ Gst.init, all plugins:  {full_cold[0]:7.0f} ms after an update, {full_warm[0]:6.0f} ms warm "
+        f"({full_warm[1]} element factories)")
+    log(f"⏱️ Gst.init, cached set:  {cached_cold[0]:7.0f} ms after an update, {cached_warm[0]:6.0f} ms warm "
+        f"({cached_warm[1]} element factories)")
+    settings["plugin_cache"] = {"plugins": sorted(plugins), "elements": list(REGISTRY_ELEMENTS),
+                                "fingerprint": plugin_fingerprint(sorted(plugins)),
+                                "init_ms": {"all": [full_cold[0], full_warm[0]],
+                                            "cached": [cached_cold[0], cached_warm[0]]}}
+    save_settings(settings)
+    log("✅ Later starts load only the cached plugins.")
+
+
+# ---- Video sink selection ----
+def sink_desc(kind):
+    if kind == "gtksink":
+        return "gtksink name=vsink"
+    if kind == "appsink":
+        return "appsink name=vsink sync=false max-buffers=1 drop=true"
+    return f"{kind} name=vsink sync=false"
+
+def choose_sink(requested, settings):
+    # explicit --sink wins, then the remembered benchmark winner, then the preference order
+    for cand in (requested, settings.get("sink")) + SINK_CANDIDATES:
+        if cand and Gst.ElementFactory.find(cand):
+            return cand
+    return None
+
+
+# ---- Per-feed prescaling ----
+def prescale_supported():
+    scaler = Gst.ElementFactory.make("videoscale", None)
+    return scaler is not None and scaler.find_property("n-threads") is not None
+
+def prescale_caps(width, height):
+    return f"video/x-raw,width={width},height={height},pixel-aspect-ratio=1/1"
+
+def prescale_desc(idx, width, height, threads, method=None):
+    # Runs in the streaming thread of the queue in front of it, one per feed, instead of
+    # inside the compositor's aggregation thread; the pad then matches and comp only copies.
+    # No borders: like the compositor, fill the box even if the cropped feed's aspect differs.
+    method = f" method={SCALE_METHODS[method][1]}" if method else ""
+    return (f"videoscale name=scale{idx} n-threads={threads} add-borders=false{method} ! "
+            f"capsfilter name=scalecaps{idx} caps=\"{prescale_caps(width, height)}\" ! ")
+
+
+# ---- Pad geometry and scaling ----
+def align_down(value, align):
+    return value - value % align if align > 1 else value
+
+def split_geometry(width, height, align=1):
+    # feed1 left half, feed2 right half. With align > 1 widths and the second xpos are
+    # multiples of align (aligned strides for the blitter); spare columns stay background.
+    return grid_geometry(2, width, height, 2, align)
+
+def grid_geometry(n, width, height, cols, align=1):
+    rows = -(-n // cols)
+    xs = [align_down(width * c // cols, align) for c in range(cols)] + [width]
+    ys = [align_down(height * r // rows, 2 if align > 1 else 1) for r in range(rows)] + [height]
+    cells = []
+    for i in range(n):
+        r, c = divmod(i, cols)
+        w = align_down(xs[c + 1] - xs[c], align)
+        h = align_down(ys[r + 1] - ys[r], 2) if align > 1 else ys[r + 1] - ys[r]
+        cells.append((xs[c], ys[r], w, h))
+    return cells
+
+def layout_geometry(n, width, height, layout="auto", align=1, overrides=None):
+    if layout == "row" or (layout == "auto" and n <= 2):
+        cols = n
+    else:
+        cols = 1
+        while cols * cols < n:
+            cols += 1
+    cells = grid_geometry(n, width, height, cols, align)
+    for i, (fx, fy, fw, fh) in (overrides or {}).items():
+        if i < n:
+            cells[i] = (align_down(int(fx * width), align), int(fy * height),
+                        align_down(int(fw * width), align), int(fh * height))
+    return cells
+
+def converter_config(method):
+    GstVideo.VideoResamplerMethod.__gtype__ # registers the enum for the parser below
+    return Gst.Structure.new_from_string(
+        f"GstVideoConverter, GstVideoConverter.resampler-method=(GstVideoResamplerMethod){SCALE_METHODS[method][0]}")
+
+
+# ---- Capture branch ----
+def capture_caps(fmt, width, height, framerate):
+    if fmt == "raw":
+        return f"video/x-raw,format=YUY2,width={width},height={height},framerate={framerate}/1"
+    return f"image/jpeg,width={width},height={height},framerate={framerate}/1"
+
+def capture_desc(idx, device, width, height, framerate, io_mode, fmt="mjpeg"):
+    # raw YUYV goes straight to the crop; MJPEG needs jpegdec
+    decode = f"jpegdec name=dec{idx} ! " if fmt == "mjpeg" else ""
+    return (f"v4l2src name=src{idx} device={device} io-mode={io_mode} do-timestamp=true ! "
+            f"{capture_caps(fmt, width, height, framerate)} ! {decode}")
+
+def probe_io_mode(device, width, height, framerate, mode):
+    # Decoding into fakesink: frames must actually flow, CPU/frame includes the driver copy.
+    r = run_bench_pipeline(capture_desc(0, device, width, height, framerate, mode) + "fakesink name=out sync=false",
+                           "out", frames=PROBE_FRAMES, timeout=PROBE_TIMEOUT, warmup=5)
+    if "error" not in r and r["frames"] < PROBE_FRAMES - 1:
+        r = {"error": f"only {r['frames']} frames in {PROBE_TIMEOUT}s"}
+    return r
+
+def card_id(device):
+    # which card sits at /dev/videoN now: its name and the USB port it hangs off
+    node = f"/sys/class/video4linux/{os.path.basename(device)}"
+    try:
+        with open(f"{node}/name") as f:
+            card = f.read().strip()
+    except OSError:
+        card = "unknown"
+    return f"{card}@{os.path.basename(os.path.realpath(node + '/device/..'))}"
+
+def io_mode_key(device, width, height, framerate, fmt="mjpeg"):
+    # a remembered io-mode holds for this card, format and mode only
+    return f"{device}|{card_id(device)}|{fmt}|{width}x{height}@{framerate}"
+
+def forget_io_mode(device, width, height, framerate, settings):
+    # the remembered mode failed: the next start probes again
+    if settings.get("io_modes", {}).pop(io_mode_key(device, width, height, framerate), None):
+        save_settings(settings)
+
+def choose_io_mode(device, width, height, framerate, requested, settings, reprobe=False):
+    if requested and requested != "auto":
+        return requested
+    key = io_mode_key(device, width, height, framerate)
+    remembered = settings.get("io_modes", {}).get(key)
+    if remembered and not reprobe:
+        return remembered["mode"]
+
+    # every mode is measured so the savings can be reported against mmap
+    costs = {}
+    chosen = None
+    for mode in IO_MODE_PREFERENCE:
+        r = probe_io_mode(device, width, height, framerate, mode)
+        if "error" in r:
+            log(f"   {device} io-mode {mode:13s} ❌ {r['error']}")
+            continue
+        costs[mode] = r["cpu_ms"]
+        log(f"   {device} io-mode {mode:13s} ✅ {r['cpu_ms']:.2f} ms CPU/frame")
+        if chosen is None:
+            chosen = mode
+    if chosen is None:
+        log(f"⚠️ {device}: no io-mode delivered frames during the probe; using mmap")
+        return "mmap"
+    if chosen != "mmap" and "mmap" in costs and costs[chosen] >= costs["mmap"]:
+        log(f"📷 {device} uses io-mode mmap: {chosen} saved nothing ({costs[chosen]:.2f} vs "
+            f"{costs['mmap']:.2f} ms CPU/frame)")
+        chosen = "mmap"
+    elif chosen != "mmap" and "mmap" in costs:
+        saved = costs["mmap"] - costs[chosen]
+        log(f"📷 {device} uses io-mode {chosen}: {costs[chosen]:.2f} ms CPU/frame vs mmap "
+            f"{costs['mmap']:.2f} ms ({saved:+.2f} ms/frame saved)")
+    else:
+        log(f"📷 {device} uses io-mode {chosen}")
+    settings.setdefault("io_modes", {})[key] = {"mode": chosen, "cpu_ms": costs}
+    save_settings(settings)
+    return chosen
+
+
+# ---- Process-isolated capture workers ----
+class CaptureWorker:
+    # One gst-launch-1.0 process per feed does capture + decode and writes into a shmsink.
+    # jpegdec allocates straight from shmsink's shared memory (videoconvert is passthrough
+    # for the fixed format), and the compositor process's shmsrc wraps that memory, so the
+    # decoded frame is not copied between the processes.
+    def __init__(self, idx, device, width, height, framerate, io_mode, fmt, cpus=None):
+        self.idx, self.device = idx, device
+        self.width, self.height, self.framerate = width, height, framerate
+        self.io_mode, self.fmt, self.cpus = io_mode, fmt, cpus
+        self.socket_path = f"/tmp/segadoc2in1-{os.getpid()}-{os.path.basename(device)}"
+        self.proc = None
+        self.restarts = 0
+        self.pending = False # respawned, shmsrc not reconnected yet
+        self.started = time.monotonic()
+
+    def caps(self):
+        fmt = "YUY2" if self.fmt == "raw" else "I420"
+        return f"video/x-raw,format={fmt},width={self.width},height={self.height},framerate={self.framerate}/1"
+
+    def spawn(self):
+        self.stop()
+        frame = self.width * self.height * (2 if self.fmt == "raw" else 1.5)
+        desc = (capture_desc(self.idx, self.device, self.width, self.height, self.framerate, self.io_mode, self.fmt) +
+                f"videoconvert ! {self.caps()} ! shmsink socket-path={self.socket_path} "
+                f"shm-size={int(frame * WORKER_SHM_FRAMES)} wait-for-connection=false sync=false")
+        self.proc = subprocess.Popen(["gst-launch-1.0", "-q"] + shlex.split(desc), start_new_session=True,
+                                     stdout=subprocess.DEVNULL)
+        if self.cpus:
+            try: os.sched_setaffinity(self.proc.pid, self.cpus)
+            except OSError: pass
+        self.started = time.monotonic()
+        log(f"👷 feed{self.idx} capture worker pid {self.proc.pid} on {self.device}")
+
+    def respawn(self):
+        self.restarts += 1
+        self.spawn()
+        self.pending = True
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def ready(self):
+        return self.alive() and os.path.exists(self.socket_path)
+
+    def wait_ready(self, timeout=WORKER_START_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while not self.ready() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.ready()
+
+    def stop(self):
+        # Never waits: a worker stuck in the UVC driver (D state) ignores SIGKILL, and stop()
+        # runs on the GTK main loop. A reaper thread collects the process when it does exit.
+        if self.alive():
+            proc = self.proc
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            threading.Thread(target=self._reap, args=(proc,), name=f"reap-feed{self.idx}", daemon=True).start()
+        self.proc = None
+        # a stale socket would make the next shmsink fail to bind
+        try: os.unlink(self.socket_path)
+        except OSError: pass
+
+    def _reap(self, proc):
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            log(f"⚠️ feed{self.idx} worker pid {proc.pid} did not exit (stuck in the driver?)")
+            proc.wait()
+
+    def src_desc(self):
+        return (f"shmsrc name=src{self.idx} socket-path={self.socket_path} is-live=true do-timestamp=true ! "
+                f"{self.caps()} ! ")
+
+capture_workers = [] # every worker of every cabinet, stopped at exit
+atexit.register(lambda: [w.stop() for w in capture_workers])
+
+def drop_eos(pad, info):
+    # A dead worker ends its shmsrc with EOS; keep the compositor pad alive for the respawn.
+    if info.get_event().type == Gst.EventType.EOS:
+        return Gst.PadProbeReturn.DROP
+    return Gst.PadProbeReturn.OK
+
+
+# ---- Feed sources by URI ----
+def feed_spec(arg):
+    # command line feed -> /dev path for capture cards, the URI otherwise
+    if "://" not in arg:
+        return f"/dev/{arg}"
+    if arg.startswith("v4l2://"):
+        path = arg[len("v4l2://"):]
+        return path if path.startswith("/") else f"/dev/{path}"
+    return arg
+
+def is_device(spec):
+    return spec.startswith("/dev/")
+
+def feed_source(idx, spec, width, height, framerate, io_mode="mmap", fmt="mjpeg", loop=True):
+    # source fragment (or SyntheticMjpegSource) for CompositorPipeline, raw video out
+    if is_device(spec):
+        return capture_desc(idx, spec, width, height, framerate, io_mode, fmt)
+    uri = urllib.parse.urlsplit(spec)
+    q = dict(urllib.parse.parse_qsl(uri.query))
+    if uri.scheme == "file":
+        # the same recorded frames every run; identity paces them by their timestamps
+        # (timing=original) unless they should go as fast as decoding allows (timing=fast)
+        pace = "" if q.get("timing") == "fast" else "identity sync=true ! "
+        if uri.path.endswith(".mkv"):
+            return (f"filesrc name=src{idx} location=\"{uri.path}\" ! matroskademux ! jpegparse ! "
+                    f"{pace}jpegdec name=dec{idx} ! ")
+        # an elementary stream has no timestamps: jpegparse stamps it from the framerate
+        jpeg = f"image/jpeg,framerate={q.get('fps', framerate)}/1"
+        desc = (f"filesrc name=src{idx} location=\"{uri.path}\" ! {jpeg} ! jpegparse ! "
+                f"{pace}jpegdec name=dec{idx} ! ")
+        return LoopedFileSource(desc) if loop else desc
+    if uri.scheme == "shm":
+        jpeg = q.get("format") in ("jpeg", "mjpeg")
+        caps = capture_caps("mjpeg", width, height, framerate) if jpeg else \
+            f"video/x-raw,format={q.get('format', 'I420')},width={width},height={height},framerate={framerate}/1"
+        decode = f"jpegdec name=dec{idx} ! " if jpeg else ""
+        return f"shmsrc name=src{idx} socket-path={uri.path} is-live=true do-timestamp=true ! {caps} ! {decode}"
+    if uri.scheme == "test":
+        return SyntheticMjpegSource(idx, uri.netloc or "ball", width, height, framerate, q.get("motion"),
+                                    int(q["quality"]) if "quality" in q else None,
+                                    float(q["kb"]) if "kb" in q else None,
+                                    int(q.get("frames", SYNTHETIC_FRAMES)))
+    raise ValueError(f"unsupported feed {spec}")
+
+class LoopedFileSource:
+    # A filesrc fragment that starts over at the end of its file. filesrc reads in small
+    # blocks (multifilesrc loop=true would read the whole file into one buffer per pass);
+    # at EOS it is seeked back to byte 0 from the main loop. The EOS and the segment that
+    # seek brings are dropped, so jpegparse sees one endless stream and keeps stamping.
+    def __init__(self, fragment):
+        self.fragment = fragment
+        self.src = None
+        self.segments = 0
+
+    def desc(self):
+        return self.fragment
+
+    def attach(self, src):
+        self.src = src
+        src.get_static_pad("src").add_probe(Gst.PadProbeType.EVENT_DOWNSTREAM, self._on_event)
+
+    def _on_event(self, pad, info):
+        kind = info.get_event().type
+        if kind == Gst.EventType.SEGMENT:
+            self.segments += 1
+            return Gst.PadProbeReturn.DROP if self.segments > 1 else Gst.PadProbeReturn.OK
+        if kind == Gst.EventType.EOS:
+            GLib.idle_add(self._rewind) # not here: the seek waits for this streaming thread
+            return Gst.PadProbeReturn.DROP
+        return Gst.PadProbeReturn.OK
+
+    def _rewind(self):
+        self.src.seek_simple(Gst.Format.BYTES, Gst.SeekFlags.NONE, 0)
+        return False
+
+class SyntheticMjpegSource:
+    # test:// feed. A loop of JPEG frames is encoded once (shared by every pipeline that uses
+    # the same settings), then appsrc pushes them at the frame rate from its own streaming
+    # thread, so jpegdec and the compositor carry the load of a real MJPEG card.
+    encoded = {}
+    lock = threading.Lock()
+
+    def __init__(self, idx, pattern, width, height, framerate, motion=None, quality=None, kb=None,
+                 frames=SYNTHETIC_FRAMES):
+        self.idx, self.pattern, self.motion = idx, pattern, motion
+        self.width, self.height, self.framerate = width, height, int(framerate)
+        self.quality, self.kb, self.frames = quality, kb, frames
+
+    def encode(self, quality, frames):
+        motion = f" motion={self.motion}" if self.motion else ""
+        pipeline = Gst.parse_launch(
+            f"videotestsrc pattern={self.pattern}{motion} num-buffers={frames} ! "
+            f"video/x-raw,width={self.width},height={self.height},framerate={self.framerate}/1 ! "
+            f"jpegenc quality={quality} ! appsink name=out sync=false")
+        out = pipeline.get_by_name("out")
+        pipeline.set_state(Gst.State.PLAYING)
+        buffers = []
+        while True:
+            sample = out.emit("try-pull-sample", 10 * Gst.SECOND)
+            if sample is None:
+                break
+            buffers.append(sample.get_buffer())
+        pipeline.set_state(Gst.State.NULL)
+        if not buffers:
+            raise RuntimeError(f"could not encode test://{self.pattern}")
+        return buffers
+
+    def loop(self):
+        key = (self.pattern, self.motion, self.width, self.height, self.quality, self.kb, self.frames)
+        with SyntheticMjpegSource.lock:
+            if key not in self.encoded:
+                quality = self.quality or 85
+                if self.kb and not self.quality:
+                    def avg_kb(q):
+                        sample = self.encode(q, 5)
+                        return sum(b.get_size() for b in sample) / len(sample) / 1024.0
+                    quality = min(SYNTHETIC_QUALITIES, key=lambda q: abs(avg_kb(q) - self.kb))
+                buffers = self.encode(quality, self.frames)
+                size = sum(b.get_size() for b in buffers) / len(buffers) / 1024.0
+                log(f"🧪 test://{self.pattern}: {len(buffers)} frames {self.width}x{self.height}, "
+                    f"jpeg quality {quality}, {size:.0f} KB/frame")
+                self.encoded[key] = buffers
+            return self.encoded[key]
+
+    def desc(self):
+        return (f"appsrc name=src{self.idx} is-live=true format=time do-timestamp=true "
+                f"caps=\"{capture_caps('mjpeg', self.width, self.height, self.framerate)}\" ! "
+                f"jpegdec name=dec{self.idx} ! ")
+
+    def attach(self, appsrc):
+        buffers = self.loop()
+        period = 1.0 / self.framerate
+        state = {"n": 0, "due": None}
+
+        def need_data(src, length):
+            # runs on appsrc's thread: wait for the frame's slot, then push it
+            now = time.monotonic()
+            if state["due"] is None or now - state["due"] > period:
+                state["due"] = now # first frame, or fell behind: do not burst
+            elif state["due"] > now:
+                time.sleep(state["due"] - now)
+            state["due"] += period
+            src.emit("push-buffer", buffers[state["n"] % len(buffers)].copy())
+            state["n"] += 1
+
+        appsrc.connect("need-data", need_data)
+
+
+# ---- Raw vs MJPEG capture ----
+def device_caps(device):
+    src = Gst.ElementFactory.make("v4l2src", None)
+    src.set_property("device", device)
+    if src.set_state(Gst.State.READY) == Gst.StateChangeReturn.FAILURE:
+        return None
+    caps = src.get_static_pad("src").query_caps(None)
+    src.set_state(Gst.State.NULL)
+    return caps
+
+def usb_link_mbps(device):
+    # /sys/class/video4linux/videoN/device is the UVC interface; its USB device has `speed`
+    name = os.path.basename(device)
+    try:
+        with open(f"/sys/class/video4linux/{name}/device/../speed") as f:
+            return float(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def choose_capture_format(device, width, height, framerate, io_mode, requested, settings, reprobe=False):
+    if requested in ("mjpeg", "raw"):
+        return requested
+    key = f"{device} {width}x{height}@{framerate}"
+    remembered = settings.get("capture_formats", {}).get(key)
+    if remembered and not reprobe:
+        return remembered["format"]
+
+    plan = {"format": "mjpeg"}
+    caps = device_caps(device)
+    raw_mb_s = width * height * 2 * int(framerate) / 1e6
+    link = usb_link_mbps(device)
+    budget_mb_s = link / 8 * USB_RAW_BUDGET if link else None
+    plan.update(raw_mb_s=raw_mb_s, link_mbps=link)
+    if not caps or not caps.can_intersect(Gst.Caps.from_string(capture_caps("raw", width, height, framerate))):
+        log(f"   {device} has no raw YUYV {width}x{height}@{framerate}; keeping MJPEG")
+    elif budget_mb_s is not None and raw_mb_s > budget_mb_s:
+        log(f"   {device} raw YUYV needs {raw_mb_s:.0f} MB/s, USB link ({link:.0f} Mbit/s) allows "
+            f"~{budget_mb_s:.0f} MB/s; keeping MJPEG")
+    else:
+        costs = {}
+        for fmt in ("mjpeg", "raw"):
+            r = run_bench_pipeline(capture_desc(0, device, width, height, framerate, io_mode, fmt) +
+                                   "fakesink name=out sync=false", "out",
+                                   frames=PROBE_FRAMES, timeout=PROBE_TIMEOUT, warmup=5)
+            if "error" in r or r["frames"] < PROBE_FRAMES - 1:
+                log(f"   {device} {fmt:5s} ❌ {r.get('error', 'too few frames')}")
+                continue
+            costs[fmt] = r["cpu_ms"]
+        plan["cpu_ms"] = costs
+        if "raw" in costs and costs["raw"] < costs.get("mjpeg", float("inf")):
+            plan["format"] = "raw"
+    if "cpu_ms" in plan and len(plan["cpu_ms"]) == 2:
+        log(f"📷 {device} captures {plan['format']}: MJPEG+decode {plan['cpu_ms']['mjpeg']:.2f} ms/frame, "
+            f"raw {plan['cpu_ms']['raw']:.2f} ms/frame, raw bandwidth {raw_mb_s:.0f} MB/s")
+    else:
+        log(f"📷 {device} captures {plan['format']}")
+    settings.setdefault("capture_formats", {})[key] = plan
+    save_settings(settings)
+    return plan["format"]
+
+
+# ---- Thread placement ----
+def parse_affinity(spec):
+    # "feed1:1,feed2:2,comp:2-3" -> {"feed1": {1}, "feed2": {2}, "comp": {2, 3}}
+    placement = {}
+    for item in filter(None, (spec or "").split(",")):
+        role, _, cpus = item.partition(":")
+        lo, _, hi = cpus.partition("-")
+        placement[role.strip()] = set(range(int(lo), int(hi or lo) + 1))
+    return placement
+
+def thread_role(element_name):
+    # src1/dec1/q1/scale1 belong to feed1; the compositor thread also drives the sink
+    m = re.fullmatch(r"(?:src|dec|q|scale)(\d+)", element_name or "")
+    if m:
+        return f"feed{m.group(1)}"
+    return "comp" if element_name == "comp" else None
+
+def place_streaming_thread(element_name, placement, rt_priority):
+    # Called from the streaming thread itself (stream-status ENTER), so pid 0 is that thread.
+    role = thread_role(element_name)
+    if role is None or role not in placement and not rt_priority:
+        return
+    try:
+        if role in placement:
+            os.sched_setaffinity(0, placement[role])
+        if rt_priority:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(rt_priority))
+        log(f"📌 {element_name} thread ({role}) on CPUs {sorted(os.sched_getaffinity(0))}"
+            f"{f', SCHED_FIFO {rt_priority}' if rt_priority else ''}")
+    except (OSError, ValueError) as e:
+        log(f"⚠️ Could not place {element_name} thread ({role}): {e}")
+
+
+# ---- Asynchronous state changes ----
+def set_state_async(pipeline, state, done=None, timeout=STATE_TIMEOUT):
+    # set_state (and waiting for an ASYNC change) runs on a worker thread, so a v4l2 device
+    # that is slow to open or close never blocks the GTK main loop. done(ok, seconds) is
+    # called on the main loop: ok is True/False, or None when `timeout` passed first.
+    fired = []
+    t0 = time.monotonic()
+
+    def finish(ok):
+        if not fired:
+            fired.append(ok)
+            if done:
+                done(ok, time.monotonic() - t0)
+        return False
+
+    def change():
+        if state == Gst.State.NULL:
+            release_cards(pipeline)
+            finish_recordings(pipeline)
+        ret = pipeline.set_state(state)
+        if ret == Gst.StateChangeReturn.ASYNC:
+            ret = pipeline.get_state(int(timeout * Gst.SECOND))[0]
+        GLib.idle_add(finish, ret != Gst.StateChangeReturn.FAILURE)
+
+    threading.Thread(target=change, name=f"set-state-{state.value_nick}", daemon=True).start()
+    GLib.timeout_add(int(timeout * 1000), finish, None)
+
+
+# ---- Passthrough recording (--record) ----
+def record_tap(source, idx, location):
+    # The camera's own JPEG packets are teed off in front of jpegdec into a leaky queue, whose
+    # thread runs the muxer and the disk writes, so recording costs no re-encode and a slow
+    # disk drops old packets instead of stalling the display. Raw feeds (no jpegdec) get none.
+    # Returns the source with the tee spliced in and the recording branch, or (source, None).
+    decode = f"jpegdec name=dec{idx} ! "
+    if decode not in source:
+        return source, None
+    branch = (f"rectee{idx}. ! queue name=recq{idx} leaky=downstream max-size-buffers={RECORD_QUEUE_BUFFERS} "
+              f"max-size-bytes=0 max-size-time=0 ! jpegparse ! matroskamux ! "
+              f"filesink name=recsink{idx} location=\"{location}\" sync=false async=false")
+    return source.replace(decode, f"tee name=rectee{idx} ! {decode}"), branch
+
+def release_cards(pipeline):
+    # Stop the capture cards first, so a standby pipeline can open them while the muxers
+    # below are still writing their index (which may take RECORD_FINISH_TIMEOUT).
+    for el in pipeline.iterate_elements():
+        factory = el.get_factory()
+        if factory and factory.get_name() == "v4l2src":
+            el.set_state(Gst.State.NULL)
+
+def finish_recordings(pipeline, timeout=RECORD_FINISH_TIMEOUT):
+    # EOS down each recording branch of a playing pipeline so matroskamux writes its index
+    # (duration, cues) before the file is closed
+    if pipeline.get_state(0)[1] != Gst.State.PLAYING:
+        return
+    waits = []
+    for queue in pipeline.iterate_elements():
+        m = re.fullmatch(r"recq(\d+)", queue.get_name())
+        if not m:
+            continue
+        done = threading.Event()
+
+        def on_event(pad, info, done=done):
+            if info.get_event().type == Gst.EventType.EOS:
+                done.set()
+            return Gst.PadProbeReturn.OK
+
+        sink = pipeline.get_by_name(f"recsink{m.group(1)}")
+        sink.get_static_pad("sink").add_probe(Gst.PadProbeType.EVENT_DOWNSTREAM, on_event)
+        if queue.get_static_pad("sink").send_event(Gst.Event.new_eos()):
+            waits.append(done)
+    deadline = time.monotonic() + timeout
+    for done in waits:
+        done.wait(max(0.0, deadline - time.monotonic()))
+
+
+# ---- Instant replay (--replay) ----
+class ReplayRing:
+    # The last `seconds` of one feed's compressed JPEG frames, never more than `max_bytes`.
+    # Frames are copied out of the capture buffers in the probe (holding v4l2 buffers would
+    # starve the driver's pool); the oldest go first, so the footprint stays fixed.
+    def __init__(self, seconds, max_bytes):
+        self.seconds, self.max_bytes = seconds, max_bytes
+        self.frames = [] # (monotonic time, bytes)
+        self.first = 0   # index of the oldest frame still in use
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def attach(self, pad):
+        # pad = the pad that feeds jpegdec; the ring outlives the pipeline it is attached to
+        pad.add_probe(Gst.PadProbeType.BUFFER, self._on_buffer)
+
+    def _on_buffer(self, pad, info):
+        buf = info.get_buffer()
+        self.add(buf.extract_dup(0, buf.get_size()), time.monotonic())
+        return Gst.PadProbeReturn.OK
+
+    def add(self, data, now):
+        with self.lock:
+            self.frames.append((now, data))
+            self.bytes += len(data)
+            while self.first < len(self.frames) and (self.bytes > self.max_bytes or
+                                                     now - self.frames[self.first][0] > self.seconds):
+                self.bytes -= len(self.frames[self.first][1])
+                self.frames[self.first] = None
+                self.first += 1
+            if self.first > 1024 and self.first * 2 > len(self.frames):
+                self.frames = self.frames[self.first:] # compact now and then, not per frame
+                self.first = 0
+
+    def snapshot(self):
+        with self.lock:
+            return self.frames[self.first:]
+
+def write_replay(frames, path):
+    # MJPEG elementary stream: plays with file://PATH?fps=N here, or ffplay -f mjpeg
+    with open(path + ".tmp", "wb") as f:
+        for _, data in frames:
+            f.write(data)
+    os.replace(path + ".tmp", path)
+
+class ReplayPlayer:
+    # Overlay source for CompositorPipeline: an appsrc that replays a ring snapshot with its
+    # original frame timing, looping, until stopped. Paced from appsrc's need-data callback.
+    def __init__(self):
+        self.frames = None
+        self.n = 0
+        self.due = None
+
+    def desc(self, name):
+        return f"appsrc name={name} is-live=true format=time do-timestamp=true caps=image/jpeg ! jpegdec ! "
+
+    def attach(self, appsrc):
+        appsrc.connect("need-data", self._need_data)
+
+    def play(self, frames, appsrc):
+        self.frames, self.n, self.due = frames, 0, time.monotonic()
+        self._push(appsrc) # appsrc waits for data once need-data went unanswered
+
+    def stop(self):
+        self.frames = None
+
+    def _push(self, appsrc):
+        frames = self.frames
+        if not frames:
+            return
+        i = self.n % len(frames)
+        # wait as long as the original gap to the next frame (the loop restarts at once)
+        gap = frames[i + 1][0] - frames[i][0] if i + 1 < len(frames) else 0.0
+        appsrc.emit("push-buffer", Gst.Buffer.new_wrapped(frames[i][1]))
+        self.n += 1
+        self.due += gap
+
+    def _need_data(self, src, length):
+        if not self.frames:
+            return # hidden: appsrc waits until play() pushes again
+        delay = self.due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._push(src)
+
+
+# ---- Stats overlay (H) ----
+class StatsHud:
+    # Overlay for CompositorPipeline: the lines() text drawn with cairo into one cached
+    # surface, redrawn and pushed once per HUD_INTERVAL_MS from the main loop. The frame has
+    # no duration (framerate 0/1), so the compositor keeps blending it until the next one.
+    # Hidden, nothing is drawn and the pad has alpha 0, which the compositor skips.
+    def __init__(self, lines, rows):
+        import cairo # optional: python3-cairo, usually installed with PyGObject
+        self.cairo = cairo
+        self.lines = lines
+        self.width, self.height = HUD_WIDTH, 2 * (HUD_LINE // 2) + rows * HUD_LINE
+        self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.width, self.height) # BGRA in memory
+        self.visible = False
+        self.appsrc = None
+        self.frame = None
+        self.timer = None
+
+    def desc(self, name):
+        return (f"appsrc name={name} is-live=true format=time do-timestamp=true "
+                f"caps=\"video/x-raw,format=BGRA,width={self.width},height={self.height},framerate=0/1\" ! ")
+
+    def use(self, appsrc):
+        # Called when a pipeline goes on screen (Cabinet._adopt), not when one is built: a
+        # --standby pipeline is built ahead and would otherwise take the HUD frames. It gets
+        # the current picture at once.
+        self.appsrc = appsrc
+        if self.visible and self.frame:
+            self._push()
+
+    def show(self, visible):
+        self.visible = visible
+        if visible and self.timer is None:
+            self._tick()
+            self.timer = GLib.timeout_add(HUD_INTERVAL_MS, self._tick)
+        elif not visible and self.timer is not None:
+            GLib.source_remove(self.timer)
+            self.timer = None
+
+    def _tick(self):
+        cairo = self.cairo
+        ctx = cairo.Context(self.surface)
+        ctx.set_operator(cairo.OPERATOR_SOURCE)
+        ctx.set_source_rgba(0, 0, 0, 0.6)
+        ctx.paint()
+        ctx.set_operator(cairo.OPERATOR_OVER)
+        ctx.select_font_face("monospace")
+        ctx.set_font_size(HUD_FONT)
+        ctx.set_source_rgb(1, 1, 1)
+        for i, line in enumerate(self.lines()):
+            ctx.move_to(HUD_LINE // 2, HUD_LINE // 2 + (i + 1) * HUD_LINE - 4)
+            ctx.show_text(line)
+        self.surface.flush()
+        self.frame = bytes(self.surface.get_data())
+        self._push()
+        return True
+
+    def _push(self):
+        if self.appsrc:
+            self.appsrc.emit("push-buffer", Gst.Buffer.new_wrapped(self.frame))
+
+
+# ---- Network output (--stream) ----
+def stream_desc(url, width, height, kbps):
+    # The queue's thread scales, converts and encodes: a slow encoder or network drops
+    # stream frames, not display frames.
+    u = urllib.parse.urlsplit(url)
+    encode = (f"queue name=netq leaky=downstream max-size-buffers=1 max-size-bytes=0 max-size-time=0 ! "
+              f"videoscale ! videoconvert ! video/x-raw,format=I420,width={width},height={height} ! "
+              f"x264enc name=netenc tune=zerolatency speed-preset=ultrafast bitrate={kbps} "
+              f"key-int-max={STREAM_KEYFRAME_FRAMES} threads={STREAM_ENCODER_THREADS} ! ")
+    if u.scheme == "udp":
+        return (encode + f"rtph264pay config-interval=1 pt=96 ! "
+                f"udpsink name=netsink host={u.hostname} port={u.port} sync=false async=false")
+    if u.scheme == "srt":
+        return (encode + f"h264parse ! mpegtsmux alignment=7 ! "
+                f"srtsink name=netsink uri=\"{url}\" wait-for-connection=false sync=false async=false")
+    raise ValueError(f"unsupported stream {url} (use udp://host:port or srt://host:port)")
+
+def stream_url(url, offset):
+    # one port per cabinet
+    u = urllib.parse.urlsplit(url)
+    return u._replace(netloc=f"{u.hostname}:{u.port + offset}").geturl()
+
+
+# ---- Monitoring thumbnails (--thumbnail) ----
+def thumbnail_desc(width):
+    # A probe on thumbq's sink pad lets one frame per interval in (CompositorPipeline), so
+    # videoscale and jpegenc run once per interval; every other frame costs only that probe.
+    return (f"queue name=thumbq leaky=downstream max-size-buffers=1 max-size-bytes=0 max-size-time=0 ! "
+            f"videoscale ! videoconvert ! video/x-raw,width={width},pixel-aspect-ratio=1/1 ! "
+            f"jpegenc quality={THUMB_QUALITY} ! "
+            f"appsink name=thumbsink emit-signals=true sync=false async=false max-buffers=1 drop=true")
+
+def cabinet_path(path, default, name=""):
+    # --option[=PATH], True = `default` in /dev/shm; with several cabinets each gets its own file
+    root, ext = os.path.splitext(os.path.join(SHM_DIR, default) if path is True else path)
+    return f"{root}-{name}{ext}" if name else root + ext
+
+def write_thumbnail(data, path):
+    # a reader sees the previous JPEG or the new one, never a partial file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ---- Shared-memory output (--shm-out) ----
+def shm_out_caps(width, height, fmt):
+    return f"video/x-raw,format={fmt},width={width},height={height}"
+
+def shm_out_desc(caps):
+    # Conversion and the copy into the ring run on the queue's thread (ShmRingWriter).
+    return (f"queue name=shmoutq leaky=downstream max-size-buffers=1 max-size-bytes=0 max-size-time=0 ! "
+            f"videoscale ! videoconvert ! {caps} ! "
+            f"appsink name=shmoutsink emit-signals=true sync=false async=false max-buffers=1 drop=true")
+
+class ShmRingWriter:
+    # Composited frames for other local processes: a file in /dev/shm that holds the last
+    # `slots` frames, each with a sequence number, pts and publish time. A slot's seq is 0
+    # while the frame is copied in and set afterwards, so a reader that sees the same seq
+    # before and after using a slot in place knows it was not overwritten (ShmFrameReader.py).
+    # The writer belongs to the window and outlives its pipelines; readers keep their mapping.
+    def __init__(self, path, caps, slots=SHM_OUT_SLOTS):
+        info = GstVideo.VideoInfo.new_from_caps(Gst.Caps.from_string(caps))
+        self.path, self.caps, self.slots = path, caps, slots
+        self.frame_size = info.size
+        self.slot_size = SHM_SLOT_DATA + -(-info.size // 64) * 64
+        size = SHM_RING_DATA + slots * self.slot_size
+        try: os.unlink(path) # a reader of an old ring keeps its own copy of the file
+        except OSError: pass
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        planes = info.finfo.n_planes
+        strides = (list(info.stride[:planes]) + [0] * 4)[:4]
+        offsets = (list(info.offset[:planes]) + [0] * 4)[:4]
+        SHM_RING_HEADER.pack_into(self.mm, 0, SHM_RING_MAGIC, 1, SHM_RING_DATA, slots, self.slot_size,
+                                  info.width, info.height, info.finfo.name.encode(), info.size, *strides, *offsets)
+        self.seq = 0
+        self.stats = {"frames": 0, "bytes": 0, "copy": 0.0}
+        self.sink = self.handler = None
+        self.lock = threading.Lock() # a slot is written whole, even while pipelines change over
+
+    def attach(self, appsink):
+        # one pipeline publishes at a time: the previous one is disconnected
+        with self.lock:
+            self._disconnect()
+            self.sink, self.handler = appsink, appsink.connect("new-sample", self._on_sample)
+
+    def detach(self):
+        with self.lock:
+            self._disconnect()
+
+    def _disconnect(self):
+        if self.sink is not None:
+            self.sink.disconnect(self.handler)
+            self.sink = self.handler = None
+
+    def _on_sample(self, sink):
+        buf = sink.emit("pull-sample").get_buffer()
+        with self.lock:
+            if sink is not self.sink or self.mm.closed:
+                return Gst.FlowReturn.OK # from a pipeline that was just retired
+            self._publish(buf)
+        return Gst.FlowReturn.OK
+
+    def _publish(self, buf):
+        t = time.perf_counter()
+        self.seq += 1
+        off = SHM_RING_DATA + (self.seq % self.slots) * self.slot_size
+        SHM_SLOT.pack_into(self.mm, off, 0, 0, 0, 0)
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return
+        n = min(info.size, self.frame_size)
+        start = off + SHM_SLOT_DATA
+        self.mm[start:start + n] = info.data if n == info.size else info.data[:n]
+        buf.unmap(info)
+        pts = buf.pts if buf.pts != Gst.CLOCK_TIME_NONE else 0
+        SHM_SLOT.pack_into(self.mm, off, self.seq, pts, time.monotonic_ns(), n)
+        struct.pack_into("<Q", self.mm, SHM_RING_LATEST, self.seq)
+        self.stats["frames"] += 1
+        self.stats["bytes"] += n
+        self.stats["copy"] += time.perf_counter() - t
+
+    def report(self):
+        s = self.stats
+        if not s["frames"]:
+            return []
+        line = (f"🧷 {self.path}: {s['frames']} frames published ({s['bytes'] / 1e6:.0f} MB), "
+                f"copy into the ring {1000.0 * s['copy'] / s['frames']:.2f} ms/frame, seq {self.seq}")
+        self.stats = {"frames": 0, "bytes": 0, "copy": 0.0}
+        return [line]
+
+    def close(self):
+        with self.lock:
+            self._disconnect()
+            self.mm.close()
+        try: os.unlink(self.path)
+        except OSError: pass
+
+def bench_shm_out(width, height, fmt, framerate):
+    # Two synthetic 1080p feeds composited as fast as they go; the ring branch takes what it can.
+    caps = shm_out_caps(width, height, fmt)
+    writer = ShmRingWriter(os.path.join(SHM_DIR, f"segadoc2in1-bench-{os.getpid()}"), caps)
+    try:
+        stage = CompositorPipeline([test_source(1, framerate=framerate, live=False),
+                                    test_source(2, framerate=framerate, live=False)],
+                                   WINDOW_WIDTH, WINDOW_HEIGHT, DEFAULT_CROPS, shm_out=writer)
+        stage.build()
+        stage.attach_outputs()
+        r = run_bench_pipeline(stage.pipeline, "shmoutsink")
+        if "error" in r:
+            log(f"❌ Ring benchmark failed: {r['error']}")
+            return None
+        s = writer.stats
+        log(f"⏱️ {caps} into a {writer.slots}-slot ring: {r['fps']:.1f} frames/s published, "
+            f"{r['fps'] * writer.frame_size / 1e6:.0f} MB/s, copy {1000.0 * s['copy'] / max(s['frames'], 1):.2f} ms/frame, "
+            f"{r['cpu_ms']:.2f} ms CPU/frame for the whole pipeline")
+        return r
+    finally:
+        writer.close()
+
+
+# ---- Screenshots (S) ----
+class Screenshot:
+    # One S press. The composite is the sink's last sample; each feed's next frame is taken
+    # uncropped by a one-shot probe in front of its videocrop and copied, so no capture buffer
+    # is held. With --damage a feed's last decoded frame is used instead. A worker thread waits for them, then encodes and writes every image; the
+    # streaming threads only pay for the copy. Presses while it runs are folded into it.
+    def __init__(self, stage, folder, prefix="", fmt="png"):
+        self.stage, self.folder, self.prefix, self.fmt = stage, folder, prefix, fmt
+        self.presses = 1
+        self.samples = {}
+        self.probes = {} # feed name -> (pad, probe id) still waiting for a frame
+        self.lock = threading.Lock()
+        self.all_feeds = threading.Event()
+
+    def start(self, done):
+        # main thread; done(lines) is called on the main loop
+        self.t0 = time.perf_counter()
+        composite = self.stage.vsink.get_property("last-sample")
+        if composite is not None:
+            self.samples["composite"] = composite
+        decoded = self.stage.last_decoded
+        for i, crop in enumerate(self.stage.crops):
+            pad, name = crop.get_static_pad("sink"), f"feed{i + 1}"
+            with self.lock: # the probe may fire before add_probe returns
+                if i < len(decoded) and decoded[i]:
+                    # --damage: a feed that repeats sends nothing past jpegdec; what it shows is
+                    # its last decoded frame
+                    self.samples[name] = Gst.Sample.new(decoded[i][0], decoded[i][1], None, None)
+                else:
+                    self.probes[name] = (pad, pad.add_probe(Gst.PadProbeType.BUFFER, self._on_feed, name))
+        if not self.probes:
+            self.all_feeds.set()
+        threading.Thread(target=self._save, args=(done,), name="screenshot", daemon=True).start()
+
+    def _on_feed(self, pad, info, name):
+        sample = Gst.Sample.new(info.get_buffer().copy_deep(), pad.get_current_caps(), None, None)
+        with self.lock:
+            if self.probes.pop(name, None) is None:
+                return Gst.PadProbeReturn.REMOVE # too late: _save gave up on this feed
+            self.samples[name] = sample
+            if sum(k.startswith("feed") for k in self.samples) == len(self.stage.crops):
+                self.all_feeds.set()
+        return Gst.PadProbeReturn.REMOVE
+
+    def _save(self, done):
+        self.all_feeds.wait(SCREENSHOT_FEED_TIMEOUT)
+        with self.lock:
+            samples = dict(self.samples)
+            leftover, self.probes = self.probes, {}
+        for pad, probe_id in leftover.values():
+            pad.remove_probe(probe_id) # a feed that sent nothing: do not leave its probe behind
+        grabbed = (time.perf_counter() - self.t0) * 1000.0
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        ext = "jpg" if self.fmt == "jpeg" else self.fmt
+        lines = []
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            for name, sample in sorted(samples.items()):
+                t = time.perf_counter()
+                image = GstVideo.video_convert_sample(sample, Gst.Caps.from_string(SCREENSHOT_FORMATS[self.fmt]),
+                                                      Gst.CLOCK_TIME_NONE)
+                buf = image.get_buffer()
+                path = os.path.join(self.folder, f"shot-{self.prefix}{name}-{stamp}.{ext}")
+                with open(path, "wb") as f:
+                    f.write(buf.extract_dup(0, buf.get_size()))
+                lines.append(f"📸 {name}: {(time.perf_counter() - t) * 1000:.0f} ms to encode + write -> {path}")
+        except (GLib.Error, OSError) as e:
+            lines.append(f"❌ Screenshot could not be saved: {e}")
+        missing = [f"feed{i + 1}" for i in range(len(self.stage.crops)) if f"feed{i + 1}" not in samples]
+        if missing:
+            lines.append(f"⚠️ No frame from {', '.join(missing)} within {SCREENSHOT_FEED_TIMEOUT}s.")
+        with self.lock:
+            presses = self.presses
+        lines.append(f"📸 Screenshot done in {(time.perf_counter() - self.t0) * 1000:.0f} ms "
+                     f"(frames grabbed in {grabbed:.0f} ms{f', {presses} presses' if presses > 1 else ''}).")
+        GLib.idle_add(done, lines)
+
+    def press(self):
+        # S again while this one is still being saved
+        with self.lock:
+            self.presses += 1
+
+
+# ---- Analytics taps (--tap) ----
+class TapFrame:
+    # What a tap callback gets. planes are read-only NumPy uint8 views (rows x row bytes)
+    # over the mapped GstBuffer, image is plane 0 as rows x pixels [x bytes per pixel]; none
+    # of it is copied, and all of it is only valid until the callback returns.
+    def __init__(self, source, pts, time, width, height, format, planes, image):
+        self.source, self.pts, self.time = source, pts, time
+        self.width, self.height, self.format = width, height, format
+        self.planes, self.image = planes, image
+
+def maps_in_place():
+    # gst-python's overrides (python3-gst-1.0) map a buffer to a memoryview over its memory;
+    # plain PyGObject hands back bytes, a copy of the whole buffer on every map
+    buf = Gst.Buffer.new_wrapped(b"\0")
+    ok, mapped = buf.map(Gst.MapFlags.READ)
+    if not ok:
+        return False
+    try:
+        return isinstance(mapped.data, memoryview)
+    finally:
+        buf.unmap(mapped)
+
+class FrameTap:
+    # Hands the newest frame of `source` ("composite" or "feedN") to callback(frame) on its
+    # own worker thread, at most once per `every` seconds. The pad probe on the streaming
+    # thread only checks the time and keeps a reference to the buffer; when the worker is
+    # still busy the frame is skipped, so at most one buffer per tap is held at any time.
+    in_place = None # maps_in_place(), checked once
+
+    def __init__(self, callback, source="composite", every=TAP_EVERY, name=None):
+        self.callback, self.source, self.every = callback, source, every
+        self.name = name or getattr(callback, "__name__", "tap")
+        self.due = 0.0
+        self.pending = None
+        self.busy = False
+        self.cond = threading.Condition()
+        self.thread = None
+        self.probe = None # (pad, probe id) in the pipeline on screen
+        self.stats = {"frames": 0, "skipped": 0, "errors": 0, "ms": 0.0, "max": 0.0}
+
+    def pad(self, pipeline):
+        # the frame as shown, or a feed after its crop
+        if self.source == "composite":
+            return pipeline.get_by_name("vsink").get_static_pad("sink")
+        crop = pipeline.get_by_name(f"crop{self.source[len('feed'):]}") if self.source.startswith("feed") else None
+        if crop is None:
+            raise ValueError(f"{self.name}: no tap source {self.source} (use composite or feed1..feedN)")
+        return crop.get_static_pad("src")
+
+    def attach(self, pipeline):
+        import numpy # optional: only analytics plugins need it
+        self.numpy = numpy
+        if FrameTap.in_place is None:
+            FrameTap.in_place = maps_in_place()
+            if not FrameTap.in_place:
+                log("⚠️ Taps copy every frame they get: buffers map to bytes without gst-python "
+                    "(sudo apt install python3-gst-1.0).")
+        pad = self.pad(pipeline)
+        self.detach() # the pipeline it replaces
+        self.probe = (pad, pad.add_probe(Gst.PadProbeType.BUFFER, self._on_buffer))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f"tap-{self.name}", daemon=True)
+            self.thread.start()
+
+    def detach(self):
+        if self.probe:
+            pad, probe_id = self.probe
+            pad.remove_probe(probe_id)
+            self.probe = None
+
+    def _on_buffer(self, pad, info):
+        now = time.monotonic()
+        if now < self.due:
+            return Gst.PadProbeReturn.OK
+        self.due = now + self.every
+        with self.cond:
+            if self.busy:
+                self.stats["skipped"] += 1
+            else:
+                self.pending = (info.get_buffer(), pad.get_current_caps(), now)
+                self.busy = True
+                self.cond.notify()
+        return Gst.PadProbeReturn.OK
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                buf, caps, at = self.pending
+                self.pending = None
+            t = time.perf_counter()
+            try:
+                self._deliver(buf, caps, at)
+                self.stats["frames"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.stats["errors"] == 1:
+                    log(f"⚠️ Tap {self.name} failed: {e!r} (further errors are only counted)")
+            ms = (time.perf_counter() - t) * 1000.0
+            self.stats["ms"] += ms
+            self.stats["max"] = max(self.stats["max"], ms)
+            del buf
+            with self.cond:
+                self.busy = False
+
+    def _deliver(self, buf, caps, at):
+        info = GstVideo.VideoInfo.new_from_caps(caps)
+        meta = GstVideo.buffer_get_video_meta(buf) # strides/offsets of the actual buffer, if it has its own
+        strides = meta.stride if meta else info.stride
+        offsets = meta.offset if meta else info.offset
+        ok, mapped = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            raise RuntimeError("buffer could not be mapped")
+        try:
+            np, finfo = self.numpy, info.finfo
+            data = np.frombuffer(mapped.data, dtype=np.uint8) # a view if FrameTap.in_place, else over a copy
+            planes = []
+            for p in range(finfo.n_planes):
+                rows = -(-info.height >> finfo.h_sub[p]) if finfo.h_sub[p] else info.height
+                cols = (-(-info.width >> finfo.w_sub[p]) if finfo.w_sub[p] else info.width) * finfo.pixel_stride[p]
+                planes.append(np.lib.stride_tricks.as_strided(data[offsets[p]:], (rows, cols), (strides[p], 1),
+                                                              writeable=False))
+            step = finfo.pixel_stride[0]
+            image = planes[0].reshape(planes[0].shape[0], -1, step) if step > 1 else planes[0]
+            self.callback(TapFrame(self.source, buf.pts, at, info.width, info.height, finfo.name, planes, image))
+        finally:
+            buf.unmap(mapped)
+
+    def report(self):
+        s = self.stats
+        if not (s["frames"] or s["skipped"] or s["errors"]):
+            return []
+        runs = s["frames"] + s["errors"]
+        line = (f"🔬 {self.name} ({self.source}): {s['frames']} frames, "
+                f"{s['ms'] / runs if runs else 0.0:.1f} ms avg / {s['max']:.1f} ms max per frame, "
+                f"{s['skipped']} skipped while busy, {s['errors']} errors")
+        s.update(frames=0, skipped=0, errors=0, ms=0.0, max=0.0)
+        return [line]
+
+def load_tap(path, source=None, every=None):
+    # --tap=plugin.py: on_frame(frame) is required, SOURCE and EVERY are optional
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not callable(getattr(module, "on_frame", None)):
+        raise ValueError(f"{path} has no on_frame(frame)")
+    return FrameTap(module.on_frame, source or getattr(module, "SOURCE", "composite"),
+                    float(every or getattr(module, "EVERY", TAP_EVERY)), os.path.basename(path))
+
+
+# ---- UI responsiveness ----
+class UiResponsiveness:
+    # Key press to handled latency (from the X/Wayland event timestamp, which is CLOCK_MONOTONIC
+    # milliseconds like GLib's monotonic time) and main loop stalls seen by a heartbeat.
+    def __init__(self):
+        self.key_ms = []
+        self.worst_stall_ms = 0.0
+        self.last_beat = None
+
+    def key_handled(self, event):
+        now_ms = GLib.get_monotonic_time() // 1000
+        age = (now_ms - event.time) & 0xFFFFFFFF
+        if age < 10000: # ignore clocks that do not match
+            self.key_ms.append(float(age))
+
+    def start_heartbeat(self, interval_ms=UI_HEARTBEAT_MS):
+        self.last_beat = time.monotonic()
+        GLib.timeout_add(interval_ms, self._beat, interval_ms)
+
+    def _beat(self, interval_ms):
+        now = time.monotonic()
+        late_ms = (now - self.last_beat) * 1000.0 - interval_ms
+        self.worst_stall_ms = max(self.worst_stall_ms, late_ms)
+        self.last_beat = now
+        return True
+
+    def report(self):
+        line = "🎛️ UI:"
+        if self.key_ms:
+            keys = sorted(self.key_ms)
+            p95 = keys[min(len(keys) - 1, int(0.95 * len(keys)))]
+            line += (f" key press to handled avg {sum(keys) / len(keys):.1f} ms, p95 {p95:.0f} ms, "
+                     f"max {keys[-1]:.0f} ms over {len(keys)} presses;")
+        if self.last_beat is not None:
+            line += f" worst main loop stall {self.worst_stall_ms:.0f} ms"
+        return line
+
+ui_stats = UiResponsiveness()
+
+
+# ---- Per-pipeline metrics ----
+class JitterHistogram:
+    # Deviation of frame intervals from the nominal period, bucketed by JITTER_BUCKETS_MS.
+    def __init__(self, period):
+        self.period = period
+        self.counts = [0] * (len(JITTER_BUCKETS_MS) + 1)
+        self.worst = 0.0
+        self.last = None
+
+    def add(self, now):
+        if self.last is not None:
+            dev_ms = abs(now - self.last - self.period) * 1000.0
+            self.counts[bisect.bisect_left(JITTER_BUCKETS_MS, dev_ms)] += 1
+            self.worst = max(self.worst, dev_ms)
+        self.last = now
+
+    def format(self):
+        total = sum(self.counts) or 1
+        labels = [f"<{b}" for b in JITTER_BUCKETS_MS] + [f">{JITTER_BUCKETS_MS[-1]}"]
+        cells = " ".join(f"{l}:{100.0 * c / total:.1f}%" for l, c in zip(labels, self.counts))
+        return f"{cells} ms, max {self.worst:.1f} ms"
+
+    def chart(self, width=40):
+        top = max(self.counts) or 1
+        labels = [f"< {b:4} ms" for b in JITTER_BUCKETS_MS] + [f"> {JITTER_BUCKETS_MS[-1]:4} ms"]
+        return [f"{l} {'█' * round(width * c / top):{width}s} {c}" for l, c in zip(labels, self.counts)]
+
+
+class PipelineMetrics:
+    # Frames out of the compositor, frames per feed (after crop, plus the --damage repeats that
+    # never get there), leaky-queue drops and the age of each feed's frames after decode
+    # (running time now - capture timestamp). The counters only grow; report() and the HUD
+    # each diff them against their own snapshot.
+    def __init__(self, name, jitter_period=None):
+        self.name = name
+        self.errors = 0
+        self.jitter_period = jitter_period
+        self.epoch = 0
+        self.attach(None, 0)
+        self.last = self.counters()
+
+    def attach(self, pipeline, n_feeds):
+        self.pipeline = pipeline
+        self.epoch += 1 # a new pipeline starts from zero
+        self.frames_out = 0
+        self.feed_frames = [0] * n_feeds
+        self.feed_drops = [0] * n_feeds
+        self.feed_latency = [0.0] * n_feeds # seconds, summed over feed_timed frames
+        self.feed_timed = [0] * n_feeds
+        self.last_feed = [0.0] * n_feeds
+        self.since = time.monotonic()
+        self.jitter = None
+        if self.jitter_period:
+            # [output, feed1, feed2, ...]
+            self.jitter = [JitterHistogram(self.jitter_period) for _ in range(n_feeds + 1)]
+        if pipeline is None:
+            return
+        sink = pipeline.get_by_name("vsink")
+        sink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_out)
+        for i in range(n_feeds):
+            crop = pipeline.get_by_name(f"crop{i + 1}")
+            crop.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_feed, i)
+            pipeline.get_by_name(f"q{i + 1}").connect("overrun", self._on_overrun, i)
+
+    def _on_out(self, pad, info):
+        self.frames_out += 1
+        if self.jitter:
+            self.jitter[0].add(time.perf_counter())
+        return Gst.PadProbeReturn.OK
+
+    def _on_feed(self, pad, info, i):
+        self.count_feed(i)
+        clock, pts = self.pipeline.get_clock(), info.get_buffer().pts
+        if clock and pts != Gst.CLOCK_TIME_NONE:
+            age = (clock.get_time() - self.pipeline.get_base_time() - pts) / Gst.SECOND
+            self.feed_latency[i] += age if 0 <= age < 10 else 0.0
+            self.feed_timed[i] += 1
+        return Gst.PadProbeReturn.OK
+
+    def count_feed(self, i):
+        # also called (CompositorPipeline.on_repeat) for a repeated JPEG that --damage drops
+        # before decode; it has no decoded age, so it does not count towards the latency
+        self.feed_frames[i] += 1
+        self.last_feed[i] = time.monotonic()
+        if self.jitter:
+            self.jitter[i + 1].add(time.perf_counter())
+
+    def _on_overrun(self, queue, i):
+        self.feed_drops[i] += 1 # leaky=downstream drops the oldest buffer
+
+    def counters(self):
+        return {"epoch": self.epoch, "t": time.monotonic(), "cpu": time.process_time(), "out": self.frames_out,
+                "feeds": list(self.feed_frames), "drops": list(self.feed_drops), "latency": list(self.feed_latency),
+                "timed": list(self.feed_timed)}
+
+    def rates(self, since):
+        # (counters now, rates since the `since` counters); a refresh restarts from zero
+        now = self.counters()
+        if since["epoch"] != now["epoch"]:
+            n = len(now["feeds"])
+            since = {"t": self.since, "cpu": since["cpu"], "out": 0, "feeds": [0] * n, "drops": [0] * n,
+                     "latency": [0.0] * n, "timed": [0] * n}
+        dt = max(now["t"] - since["t"], 1e-6)
+        frames = [a - b for a, b in zip(now["feeds"], since["feeds"])]
+        timed = [a - b for a, b in zip(now["timed"], since["timed"])]
+        return now, {
+            "out": (now["out"] - since["out"]) / dt,
+            "feeds": [f / dt for f in frames],
+            "drops": [a - b for a, b in zip(now["drops"], since["drops"])],
+            "latency_ms": [1000.0 * (a - b) / f if f else 0.0 for a, b, f in zip(now["latency"], since["latency"], timed)],
+            "cpu": 100.0 * (now["cpu"] - since["cpu"]) / dt, # whole process, % of one core
+        }
+
+    def report(self):
+        # rates since the previous report
+        self.last, r = self.rates(self.last)
+        feeds = ", ".join(f"{f:.1f}" for f in r["feeds"])
+        latency = ", ".join(f"{l:.0f}" for l in r["latency_ms"])
+        line = (f"📊 {self.name}: {r['out']:.1f} fps out, feeds [{feeds}] fps, "
+                f"drops {r['drops']}, feed latency [{latency}] ms, errors {self.errors}")
+        if self.jitter:
+            line += "\n   jitter out   " + self.jitter[0].format()
+            for i, h in enumerate(self.jitter[1:]):
+                line += f"\n   jitter feed{i + 1} " + h.format()
+        return line
+
+    def jitter_report(self):
+        lines = []
+        for i, h in enumerate(self.jitter or []):
+            lines.append(f"📈 {self.name} frame interval jitter, {'output' if i == 0 else f'feed{i}'} "
+                         f"({sum(h.counts)} intervals, max {h.worst:.1f} ms):")
+            lines += ["   " + row for row in h.chart()]
+        return "\n".join(lines)
+
+
+# ---- Compositing pipeline ----
+def test_source(idx, width=1920, height=1080, framerate=30, live=True):
+    # synthetic stand-in for a capture branch (element srcN, raw video out)
+    return (f"videotestsrc name=src{idx} pattern=ball is-live={str(live).lower()} ! "
+            f"video/x-raw,format=I420,width={width},height={height},framerate={framerate}/1 ! ")
+
+class CompositorPipeline:
+    # The compositing pipeline without any GTK: each source -> videocrop -> leaky queue ->
+    # [prescale] -> compositor pad -> optional caps -> sink. Sources are gst-launch fragments
+    # ending in "! " whose first element is srcN (capture_desc, CaptureWorker.src_desc,
+    # test_source, feed_source) or objects with desc() and attach(src) such as
+    # SyntheticMjpegSource; crops are (left, right, top, bottom) per feed and layout/align/geoms
+    # are as for layout_geometry. The window puts one on screen; with sink "fakesink" or
+    # "appsink" it runs headless, e.g. to benchmark in-process:
+    #     stage = CompositorPipeline([test_source(1), test_source(2)], 1280, 720)
+    #     print(stage.benchmark()["fps"])
+    # With record=DIR each MJPEG feed is also recorded as it arrives (record_tap). Overlays
+    # (e.g. ReplayPlayer) get compositor pads after the feeds; their owner places them
+    # through overlay_pads. An overlay is a fragment or an object with desc(name) and
+    # attach(element) whose first element is named overlayN. stream=URL tees the output into
+    # a network stream (stream_desc); thumbnail=PATH keeps a JPEG of the output there, every
+    # thumbnail_every seconds while thumbnails_on (thumbnail_desc); shm_out=ShmRingWriter
+    # publishes the output for other processes and taps are FrameTaps for analytics, both
+    # once attach_outputs() is called. damage=True skips decoding repeated JPEGs and
+    # presenting unchanged composites (_track_damage).
+    def __init__(self, sources, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, crops=None, layout="auto", align=1,
+                 geoms=None, sink="fakesink", caps=None, prescale=0, method=None, record=None, record_prefix="",
+                 overlays=(), leaky=True, stream=None, stream_size=(WINDOW_WIDTH, WINDOW_HEIGHT), stream_kbps=STREAM_KBPS,
+                 thumbnail=None, thumbnail_width=THUMB_WIDTH, thumbnail_every=THUMB_INTERVAL, shm_out=None,
+                 taps=(), damage=False):
+        self.sources = list(sources)
+        self.width, self.height = width, height
+        self.feed_crops = list(crops) if crops else [(0, 0, 0, 0)] * len(self.sources)
+        self.layout, self.align, self.feed_geoms = layout, align, geoms or {}
+        self.sink, self.caps = sink, caps
+        self.prescale, self.method = prescale, method
+        self.record = record
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        self.record_paths = {i + 1: os.path.join(record, f"{record_prefix}feed{i + 1}-{stamp}.mkv")
+                             for i in range(len(self.sources))} if record else {}
+        self.recordings = {} # feed index -> packet/byte counters while recording
+        self.overlays = list(overlays)
+        self.stream, self.stream_size, self.stream_kbps = stream, stream_size, stream_kbps
+        self.streaming = None # counters while streaming
+        self.thumbnail, self.thumbnail_width, self.thumbnail_every = thumbnail, thumbnail_width, thumbnail_every
+        self.thumbnails_on = bool(thumbnail)
+        self.thumbs = {"written": 0, "ms": 0.0, "due": 0.0}
+        self.shm_out = shm_out
+        self.taps = list(taps)
+        self.damage = damage
+        self.layout_version = 0 # bumped by invalidate(); --damage presents the next frame then
+        self.present = True # --damage: whether the frame being composited goes to the display
+        self.damage_stats = None
+        self.last_decoded = [] # --damage: (buffer, caps) per feed, the picture a repeat keeps showing
+        self.on_repeat = None # --damage: on_repeat(feed index) for each dropped repeat
+        # live: a late frame is dropped; leaky=False keeps every frame (deterministic benchmarks)
+        self.queue = ("max-size-buffers=1 max-size-bytes=0 max-size-time=0 leaky=downstream" if leaky
+                      else "max-size-buffers=2 max-size-bytes=0 max-size-time=0")
+        self.pipeline = None
+
+    def geometry(self):
+        # >>> Merged change: feed1 left half, feed2 right half; more feeds go to a grid
+        return layout_geometry(len(self.sources), self.width, self.height, self.layout, self.align, self.feed_geoms)
+
+    def describe(self):
+        geometry = self.geometry()
+        branches = recorders = ""
+        for i, source in enumerate(self.sources):
+            idx = i + 1
+            if not isinstance(source, str):
+                source = source.desc()
+            if self.record:
+                source, recorder = record_tap(source, idx, self.record_paths[idx])
+                recorders += f"\n        {recorder}" if recorder else ""
+            left, right, top, bottom = self.feed_crops[i]
+            scale = prescale_desc(idx, geometry[i][2], geometry[i][3], self.prescale, self.method) if self.prescale else ""
+            branches += f"""
+        {source} \
+            videocrop name=crop{idx} left={left} right={right} top={top} bottom={bottom} ! \
+            queue name=q{idx} {self.queue} ! {scale}comp.sink_{i}"""
+        for j, overlay in enumerate(self.overlays):
+            name = f"overlay{j + 1}"
+            source = overlay if isinstance(overlay, str) else overlay.desc(name)
+            branches += f"""
+        {source}queue max-size-buffers=1 max-size-bytes=0 max-size-time=0 leaky=downstream ! comp.sink_{len(self.sources) + j}"""
+        caps = f"{self.caps} ! " if self.caps else ""
+        taps = ([stream_desc(self.stream, *self.stream_size, self.stream_kbps)] if self.stream else []) + \
+               ([thumbnail_desc(self.thumbnail_width)] if self.thumbnail else []) + \
+               ([shm_out_desc(self.shm_out.caps)] if self.shm_out else [])
+        if taps:
+            # each output branches off the tee into its own leaky queue, whose thread does
+            # the output's work: a slow output drops its own frames, never the display's
+            caps += "tee name=outtee ! "
+            recorders += "".join(f"\n        outtee. ! {tap}" for tap in taps)
+        return f"""
+        compositor name=comp latency=0 background=transparent ! \
+            {caps}{sink_desc(self.sink)} {branches}{recorders}
+        """
+
+    def build(self):
+        self.pipeline = Gst.parse_launch(self.describe())
+        n = len(self.sources)
+        self.vsink = self.pipeline.get_by_name("vsink")
+        self.compositor = self.pipeline.get_by_name("comp")
+        self.crops = [self.pipeline.get_by_name(f"crop{i + 1}") for i in range(n)]
+        self.scalecaps = [self.pipeline.get_by_name(f"scalecaps{i + 1}") for i in range(n)]
+        self.pads = [self.compositor.get_static_pad(f"sink_{i}") for i in range(n)]
+        for i, source in enumerate(self.sources):
+            if hasattr(source, "attach"):
+                source.attach(self.pipeline.get_by_name(f"src{i + 1}"))
+        self.overlay_pads = [self.compositor.get_static_pad(f"sink_{n + j}") for j in range(len(self.overlays))]
+        for j, overlay in enumerate(self.overlays):
+            if hasattr(overlay, "attach"):
+                overlay.attach(self.pipeline.get_by_name(f"overlay{j + 1}"))
+        if self.overlays and self.compositor.find_property("ignore-inactive-pads"):
+            self.compositor.set_property("ignore-inactive-pads", True) # an idle overlay must not stall output
+        self._count_recordings()
+        if self.stream:
+            self._count_stream()
+        if self.thumbnail:
+            self._tap_thumbnails()
+        if self.damage:
+            self._track_damage()
+        if self.method:
+            for pad in self.pads:
+                pad.set_property("converter-config", converter_config(self.method))
+        self.apply_layout()
+        return self.pipeline
+
+    def _count_recordings(self):
+        self.recordings = {}
+        for idx, path in self.record_paths.items():
+            queue = self.pipeline.get_by_name(f"recq{idx}")
+            if queue is None:
+                log(f"⚠️ feed{idx} is captured raw; only MJPEG feeds are recorded.")
+                continue
+            stats = self.recordings[idx] = {"path": path, "in": 0, "out": 0, "bytes": 0, "t0": None, "queue": queue}
+
+            def on_in(pad, info, stats=stats):
+                stats["in"] += 1
+                return Gst.PadProbeReturn.OK
+
+            def on_out(pad, info, stats=stats):
+                stats["out"] += 1
+                stats["bytes"] += info.get_buffer().get_size()
+                if stats["t0"] is None:
+                    stats["t0"] = time.monotonic()
+                return Gst.PadProbeReturn.OK
+
+            queue.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_in)
+            self.pipeline.get_by_name(f"recsink{idx}").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_out)
+
+    def _count_stream(self):
+        stats = self.streaming = {"in": 0, "out": 0, "bytes": 0, "t0": None, "pending": {},
+                                  "timed": 0, "encode": 0.0, "encode_max": 0.0,
+                                  "queue": self.pipeline.get_by_name("netq")}
+        enc = self.pipeline.get_by_name("netenc")
+
+        def on_queue(pad, info):
+            stats["in"] += 1
+            return Gst.PadProbeReturn.OK
+
+        def on_raw(pad, info):
+            stats["pending"][info.get_buffer().pts] = time.perf_counter()
+            return Gst.PadProbeReturn.OK
+
+        def on_encoded(pad, info):
+            # zerolatency: no frame reordering, each input comes out with its own pts
+            buf = info.get_buffer()
+            start = stats["pending"].pop(buf.pts, None)
+            if start is not None:
+                # running sums, not a list: --stream runs all day, reports may never come
+                took = time.perf_counter() - start
+                stats["timed"] += 1
+                stats["encode"] += took
+                stats["encode_max"] = max(stats["encode_max"], took)
+            if len(stats["pending"]) > 64:
+                stats["pending"].clear() # frames the encoder dropped
+            stats["out"] += 1
+            stats["bytes"] += buf.get_size()
+            if stats["t0"] is None:
+                stats["t0"] = time.monotonic()
+            return Gst.PadProbeReturn.OK
+
+        self.pipeline.get_by_name("netq").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_queue)
+        enc.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_raw)
+        enc.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_encoded)
+
+    def stream_report(self):
+        s = self.streaming
+        if not s or not s["t0"]:
+            return []
+        secs = time.monotonic() - s["t0"]
+        queued = s["queue"].get_property("current-level-buffers")
+        dropped = max(0, s["in"] - s["out"] - queued)
+        avg = 1000.0 * s["encode"] / s["timed"] if s["timed"] else 0.0
+        worst = 1000.0 * s["encode_max"]
+        line = (f"📡 {self.stream}: {8 * s['bytes'] / 1e6 / secs:.2f} Mbit/s, {s['out'] / secs:.1f} fps, "
+                f"encode {avg:.1f} ms avg / {worst:.1f} ms max, {dropped} frames dropped before the encoder")
+        s.update({"in": 0, "out": 0, "bytes": 0, "t0": time.monotonic(), "timed": 0, "encode": 0.0, "encode_max": 0.0})
+        return [line]
+
+    def _tap_thumbnails(self):
+        stats = self.thumbs
+
+        def on_frame(pad, info):
+            # compositor thread: drop before scaling unless a thumbnail is due
+            now = time.monotonic()
+            if not self.thumbnails_on or now < stats["due"]:
+                return Gst.PadProbeReturn.DROP
+            stats["due"] = now + self.thumbnail_every
+            stats["t"] = time.perf_counter()
+            return Gst.PadProbeReturn.OK
+
+        def on_sample(sink):
+            buf = sink.emit("pull-sample").get_buffer()
+            try:
+                write_thumbnail(buf.extract_dup(0, buf.get_size()), self.thumbnail)
+            except OSError as e:
+                log(f"⚠️ Thumbnail not written: {e}")
+                return Gst.FlowReturn.OK
+            stats["written"] += 1
+            stats["ms"] += (time.perf_counter() - stats["t"]) * 1000.0
+            return Gst.FlowReturn.OK
+
+        self.pipeline.get_by_name("thumbq").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_frame)
+        self.pipeline.get_by_name("thumbsink").connect("new-sample", on_sample)
+
+    def _track_damage(self):
+        # Before decode: a JPEG with the same size and CRC as the feed's previous one is
+        # dropped, so it is not decoded, cropped or queued; the compositor keeps showing that
+        # feed's last frame. After the compositor: samples-selected tells, on the aggregator
+        # thread, which buffer of each pad goes into the next frame. If they are the ones of
+        # the last presented frame and the layout did not change, the frame is dropped in
+        # front of the display sink (same thread, after the tee). The tee branches still get
+        # every frame: the stream's keyframe interval counts frames. The live compositor
+        # still blends on its own clock.
+        n = len(self.sources)
+        st = self.damage_stats = {"decoded": [0] * n, "repeats": [0] * n, "decode_s": [0.0] * n,
+                                  "presented": 0, "skipped": 0, "t0": time.monotonic(), "cpu0": time.process_time()}
+        self.last_decoded = [None] * n
+        for i in range(n):
+            dec = self.pipeline.get_by_name(f"dec{i + 1}")
+            if dec is None:
+                log(f"⚠️ feed{i + 1} is not MJPEG decoded here; every frame of it counts as changed.")
+                continue
+            last, started = [None], {}
+
+            def on_jpeg(pad, info, i=i, last=last, started=started):
+                buf = info.get_buffer()
+                ok, mapped = buf.map(Gst.MapFlags.READ)
+                if not ok:
+                    return Gst.PadProbeReturn.OK
+                key = (mapped.size, zlib.crc32(mapped.data))
+                buf.unmap(mapped)
+                if key == last[0]:
+                    st["repeats"][i] += 1
+                    if self.on_repeat:
+                        self.on_repeat(i)
+                    return Gst.PadProbeReturn.DROP
+                last[0] = key
+                st["decoded"][i] += 1
+                started[buf.pts] = time.perf_counter()
+                return Gst.PadProbeReturn.OK
+
+            def on_decoded(pad, info, i=i, started=started):
+                # measured decode time, what a repeat saves; the frame is kept (a reference,
+                # not a capture buffer) for screenshots, since a repeat never reaches the crop
+                self.last_decoded[i] = (info.get_buffer(), pad.get_current_caps())
+                t = started.pop(info.get_buffer().pts, None)
+                if t is not None:
+                    st["decode_s"][i] += time.perf_counter() - t
+                if len(started) > 64:
+                    started.clear()
+                return Gst.PadProbeReturn.OK
+
+            dec.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_jpeg)
+            dec.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, on_decoded)
+
+        if not self.compositor.find_property("emit-signals"):
+            log("⚠️ compositor has no samples-selected (GStreamer < 1.18); every composite is presented.")
+            return
+        shown = {"inputs": None, "layout": -1}
+
+        def on_selected(comp, segment, pts, dts, duration, info):
+            inputs = []
+            for pad in comp.sinkpads:
+                sample = comp.peek_next_sample(pad)
+                inputs.append(sample.get_buffer().pts if sample and sample.get_buffer() else None)
+            inputs, layout = tuple(inputs), self.layout_version
+            self.present = inputs != shown["inputs"] or layout != shown["layout"]
+            if self.present:
+                shown.update(inputs=inputs, layout=layout)
+
+        def on_output(pad, info):
+            if not self.present:
+                st["skipped"] += 1
+                return Gst.PadProbeReturn.DROP
+            st["presented"] += 1
+            return Gst.PadProbeReturn.OK
+
+        self.compositor.set_property("emit-signals", True)
+        self.compositor.connect("samples-selected", on_selected)
+        self.vsink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_output)
+
+    def invalidate(self):
+        # pad geometry or alpha changed: present the next composite even if no feed changed
+        self.layout_version += 1
+
+    def damage_report(self):
+        st = self.damage_stats
+        if not st:
+            return []
+        secs = max(time.monotonic() - st["t0"], 1e-6)
+        cpu = 100.0 * (time.process_time() - st["cpu0"]) / secs
+        saved = 0.0
+        feeds = []
+        for i, (d, r, s) in enumerate(zip(st["decoded"], st["repeats"], st["decode_s"])):
+            per = s / d if d else 0.0
+            saved += r * per
+            feeds.append(f"feed{i + 1} {r} of {d + r} unchanged ({per * 1000:.1f} ms/decode)")
+        total = st["presented"] + st["skipped"]
+        line = (f"🟰 Damage: {', '.join(feeds)}; {st['skipped']} of {total} composites not presented; "
+                f"~{100.0 * saved / secs:.0f}% of a core saved on decoding, process CPU {cpu:.0f}%")
+        n = len(st["decoded"])
+        st.update(decoded=[0] * n, repeats=[0] * n, decode_s=[0.0] * n, presented=0, skipped=0,
+                  t0=time.monotonic(), cpu0=time.process_time())
+        return [line]
+
+    def thumbnail_report(self):
+        t = self.thumbs
+        if not self.thumbnail or not t["written"]:
+            return []
+        line = (f"🖼️ {t['written']} thumbnails -> {self.thumbnail}, scale + encode + write "
+                f"{t['ms'] / t['written']:.1f} ms avg")
+        t.update(written=0, ms=0.0)
+        return [line]
+
+    def recording_report(self):
+        lines = []
+        for idx, r in self.recordings.items():
+            secs = time.monotonic() - r["t0"] if r["t0"] else 0.0
+            queued = r["queue"].get_property("current-level-buffers")
+            dropped = max(0, r["in"] - r["out"] - queued)
+            rate = r["bytes"] / 1e6 / secs if secs > 0 else 0.0
+            lines.append(f"📼 feed{idx}: {r['bytes'] / 1e6:.1f} MB, {rate:.2f} MB/s, "
+                         f"{r['out'] / secs if secs > 0 else 0.0:.1f} packets/s, {dropped} dropped -> {r['path']}")
+        return lines
+
+    def open_sources(self):
+        # READY opens each card and a caps query enumerates its formats, so neither is left
+        # for PLAYING; the rest of the pipeline (and a gtksink's widget) stays in NULL.
+        for i in range(len(self.sources)):
+            src = self.pipeline.get_by_name(f"src{i + 1}")
+            if src.set_state(Gst.State.READY) == Gst.StateChangeReturn.FAILURE:
+                what = src.get_property("device") if src.find_property("device") else src.get_name()
+                raise RuntimeError(f"could not open {what}")
+            src.get_static_pad("src").query_caps(None)
+
+    def attach_outputs(self):
+        # The ring and taps outlive their pipelines and a standby is built while another
+        # pipeline is on screen, so build() does not connect them: the owner does when it
+        # puts this one up.
+        if self.shm_out:
+            self.shm_out.attach(self.pipeline.get_by_name("shmoutsink"))
+        for tap in self.taps:
+            tap.attach(self.pipeline)
+
+    def detach_outputs(self):
+        if self.shm_out:
+            self.shm_out.detach()
+        for tap in self.taps:
+            tap.detach()
+
+    def resize(self, width, height):
+        self.width, self.height = width, height
+        self.apply_layout()
+
+    def apply_layout(self):
+        if self.pipeline is None:
+            return
+        self.invalidate()
+        for pad, scalecaps, (x, y, w, h) in zip(self.pads, self.scalecaps, self.geometry()):
+            pad.set_property("xpos", x)
+            pad.set_property("ypos", y)
+            pad.set_property("width", w)
+            pad.set_property("height", h)
+            if scalecaps:
+                scalecaps.set_property("caps", Gst.Caps.from_string(prescale_caps(w, h)))
+
+    def benchmark(self, frames=BENCH_FRAMES, timeout=30):
+        # headless sinks only; stops early at EOS; leaves the pipeline in NULL
+        if self.pipeline is None:
+            self.build()
+        return run_bench_pipeline(self.pipeline, "vsink", frames, timeout)
+
+    def pull(self, timeout=1.0):
+        # next composited frame as a Gst.Sample (sink="appsink", pipeline PLAYING) or None
+        return self.vsink.emit("try-pull-sample", int(timeout * Gst.SECOND))
+
+
+# ---- Benchmark helpers ----
+def run_bench_pipeline(pipeline, counter_name, frames=BENCH_FRAMES, timeout=30, setup=None,
+                       warmup=BENCH_WARMUP):
+    # Runs pipeline (a description or a built pipeline) until `frames` buffers reached the
+    # sink pad of `counter_name`. Returns wall ms/frame, CPU ms/frame and the arrival
+    # intervals after warm-up.
+    if isinstance(pipeline, str):
+        pipeline = Gst.parse_launch(pipeline)
+    if setup:
+        setup(pipeline)
+    pad = pipeline.get_by_name(counter_name).get_static_pad("sink")
+    stamps = []
+
+    def on_buffer(pad, info):
+        stamps.append((time.perf_counter(), time.process_time()))
+        return Gst.PadProbeReturn.OK
+
+    pad.add_probe(Gst.PadProbeType.BUFFER, on_buffer)
+    bus = pipeline.get_bus()
+    ctx = GLib.MainContext.default()
+    error = None
+    t0 = time.perf_counter()
+    pipeline.set_state(Gst.State.PLAYING)
+    while len(stamps) < frames + warmup and time.perf_counter() - t0 < timeout:
+        while ctx.pending():
+            ctx.iteration(False) # gtksink presents on the main loop
+        msg = bus.timed_pop_filtered(5 * Gst.MSECOND, Gst.MessageType.ERROR | Gst.MessageType.EOS)
+        if msg:
+            if msg.type == Gst.MessageType.ERROR:
+                error = msg.parse_error()[0].message
+            break
+    pipeline.set_state(Gst.State.NULL)
+
+    samples = stamps[warmup:]
+    if error or len(samples) < 2:
+        return {"error": error or "no frames"}
+    n = len(samples) - 1
+    wall = samples[-1][0] - samples[0][0]
+    cpu = samples[-1][1] - samples[0][1]
+    return {
+        "frames": n,
+        "wall_ms": 1000.0 * wall / n,
+        "cpu_ms": 1000.0 * cpu / n,
+        "fps": n / wall if wall > 0 else 0.0,
+        "intervals": [b[0] - a[0] for a, b in zip(samples, samples[1:])],
+    }
+
+def bench_sinks(width, height, framerate, settings):
+    # Present cost = per-frame time with the sink minus the same source into fakesink.
+    src = (f"videotestsrc pattern=ball is-live=false ! "
+           f"video/x-raw,format=BGRx,width={width},height={height},framerate={framerate}/1 ! ")
+    base = run_bench_pipeline(src + "fakesink name=vsink sync=false", "vsink")
+    if "error" in base:
+        log(f"❌ Sink benchmark baseline failed: {base['error']}")
+        return None
+
+    results = {}
+    log(f"⏱️ Sink benchmark at {width}x{height}, {BENCH_FRAMES} frames each")
+    for kind in SINK_CANDIDATES:
+        if not Gst.ElementFactory.find(kind):
+            continue
+        r = run_bench_pipeline(src + f"{kind} name=vsink sync=false", "vsink")
+        if "error" in r:
+            log(f"   {kind:12s} ❌ {r['error']}")
+            continue
+        results[kind] = {
+            "present_ms": max(0.0, r["wall_ms"] - base["wall_ms"]),
+            "cpu_ms": max(0.0, r["cpu_ms"] - base["cpu_ms"]),
+            "fps": r["fps"],
+        }
+        log(f"   {kind:12s} present {results[kind]['present_ms']:6.2f} ms/frame  "
+            f"cpu {results[kind]['cpu_ms']:6.2f} ms/frame  ({r['fps']:.0f} fps uncapped)")
+
+    if not results:
+        return None
+    # Cheapest = least CPU among sinks that can present within one frame period.
+    budget_ms = 1000.0 / int(framerate)
+    fast = [k for k, v in results.items() if v["present_ms"] < budget_ms] or list(results)
+    best = min(fast, key=lambda k: results[k]["cpu_ms"])
+    settings["sink"] = best
+    settings["sink_bench"] = {"width": width, "height": height, "fps": int(framerate), "results": results}
+    save_settings(settings)
+    log(f"✅ Sink benchmark picked {best} (remembered in {SETTINGS_FILE})")
+    return best
+
+
+def bench_composite_desc(width, height, geometry, framerate, prescale=0, method=None):
+    # Synthetic 1080p feeds, cropped like the real ones, into a composite of width x height.
+    branches, pads = "", ""
+    for i, (x, y, w, h) in enumerate(geometry):
+        scale = prescale_desc(i + 1, w, h, prescale, method) if prescale else ""
+        branches += (f"videotestsrc pattern=ball is-live=false ! "
+                     f"video/x-raw,format=I420,width=1920,height=1080,framerate={framerate}/1 ! "
+                     f"videocrop left=40 right=53 ! queue max-size-buffers=2 ! {scale}comp.sink_{i} ")
+        pads += f" sink_{i}::xpos={x} sink_{i}::ypos={y} sink_{i}::width={w} sink_{i}::height={h}"
+    return (f"compositor name=comp{pads} ! video/x-raw,width={width},height={height} ! "
+            f"fakesink name=out sync=false {branches}")
+
+def bench_prescale(width, height, framerate, threads):
+    # Two synthetic 1080p feeds into a half-split composite, scaled in comp vs in each branch.
+    results = {}
+    geometry = split_geometry(width, height)
+    for mode in ("compositor", "prescale"):
+        r = run_bench_pipeline(bench_composite_desc(width, height, geometry, framerate,
+                                                    threads if mode == "prescale" else 0), "out")
+        if "error" in r:
+            log(f"   {mode:10s} ❌ {r['error']}")
+            continue
+        results[mode] = r
+        log(f"   {mode:10s} scaling: {r['fps']:7.1f} fps composited, "
+            f"{r['cpu_ms']:6.2f} ms CPU/frame, {100.0 * r['cpu_ms'] / r['wall_ms']:5.0f}% CPU")
+    if len(results) == 2:
+        gain = results["prescale"]["fps"] / results["compositor"]["fps"]
+        log(f"✅ Prescale throughput x{gain:.2f} on {os.cpu_count()} cores")
+    return results
+
+def bench_feed_counts(width, height, framerate, align, counts=range(2, 9)):
+    results = {}
+    log(f"⏱️ Composited fps into {width}x{height} by number of synthetic 1080p feeds")
+    for n in counts:
+        r = run_bench_pipeline(bench_composite_desc(width, height, layout_geometry(n, width, height, align=align),
+                                                    framerate), "out")
+        if "error" in r:
+            log(f"   {n} feeds ❌ {r['error']}")
+            continue
+        results[n] = r
+        log(f"   {n} feeds: {r['fps']:7.1f} fps composited, {r['cpu_ms']:6.2f} ms CPU/frame, "
+            f"{100.0 * r['cpu_ms'] / r['wall_ms']:5.0f}% CPU")
+    return results
+
+def bench_scale_methods(sizes, framerate, align):
+    results = {}
+    for width, height in sizes:
+        geometry = split_geometry(width, height, align)
+        log(f"⏱️ Composition cost at {width}x{height}, pads {[g[2] for g in geometry]} wide (align {align})")
+        for method in SCALE_METHODS:
+            def setup(pipeline, method=method):
+                for pad in pipeline.get_by_name("comp").sinkpads:
+                    pad.set_property("converter-config", converter_config(method))
+            r = run_bench_pipeline(bench_composite_desc(width, height, geometry, framerate), "out", setup=setup)
+            if "error" in r:
+                log(f"   {method:9s} ❌ {r['error']}")
+                continue
+            results[(width, height, method)] = r
+            log(f"   {method:9s} {r['wall_ms']:6.2f} ms/frame  cpu {r['cpu_ms']:6.2f} ms/frame  "
+                f"({r['fps']:.0f} fps uncapped)")
+    return results
+
+def package_energy():
+    # joules used by the CPU package so far (Intel RAPL), or None where it is not readable
+    try:
+        with open(RAPL_ENERGY) as f:
+            return int(f.read()) / 1e6
+    except (OSError, ValueError):
+        return None
+
+def run_for(pipeline, seconds, warmup=1.0):
+    # live pipeline for warmup + seconds -> process CPU % and package watts over `seconds`
+    bus = pipeline.get_bus()
+    pipeline.set_state(Gst.State.PLAYING)
+    error = None
+    start = None
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < warmup + seconds:
+        if start is None and time.monotonic() - t0 >= warmup:
+            start = (time.monotonic(), time.process_time(), package_energy())
+        msg = bus.timed_pop_filtered(50 * Gst.MSECOND, Gst.MessageType.ERROR | Gst.MessageType.EOS)
+        if msg:
+            error = msg.parse_error()[0].message if msg.type == Gst.MessageType.ERROR else "EOS"
+            break
+    pipeline.set_state(Gst.State.NULL)
+    if error or start is None:
+        return {"error": error or "stopped during warm-up"}
+    wall = time.monotonic() - start[0]
+    energy = package_energy()
+    return {"cpu_pct": 100.0 * (time.process_time() - start[1]) / wall,
+            "watts": (energy - start[2]) / wall if energy is not None and start[2] is not None else None}
+
+def bench_damage(width, height, framerate, seconds=DAMAGE_BENCH_SECONDS):
+    # Live synthetic MJPEG at the capture size: smpte is the same JPEG every frame (a menu),
+    # ball moves (a race), so static/static and moving/static show full and partial savings.
+    log(f"⏱️ Damage tracking: {width}x{height}@{framerate} MJPEG feeds into {WINDOW_WIDTH}x{WINDOW_HEIGHT}, "
+        f"{seconds} s per run")
+    results = {}
+    for scene, patterns in (("static", ("smpte", "smpte")), ("half", ("ball", "smpte"))):
+        for damage in (False, True):
+            sources = [feed_source(i + 1, f"test://{p}", width, height, framerate) for i, p in enumerate(patterns)]
+            stage = CompositorPipeline(sources, WINDOW_WIDTH, WINDOW_HEIGHT, DEFAULT_CROPS, damage=damage)
+            stage.build()
+            r = run_for(stage.pipeline, seconds)
+            if "error" in r:
+                log(f"   {scene:6s} damage {'on ' if damage else 'off'} ❌ {r['error']}")
+                continue
+            results[(scene, damage)] = r
+            watts = f", {r['watts']:.2f} W package" if r["watts"] is not None else ""
+            log(f"   {scene:6s} damage {'on ' if damage else 'off'}: CPU {r['cpu_pct']:5.1f}%{watts}")
+            if damage:
+                for line in stage.damage_report():
+                    log("      " + line)
+        if (scene, False) in results and (scene, True) in results:
+            off, on = results[(scene, False)], results[(scene, True)]
+            watts = ""
+            if off["watts"] is not None and on["watts"] is not None:
+                watts = f", {off['watts'] - on['watts']:.2f} W"
+            log(f"✅ {scene}: --damage saves {off['cpu_pct'] - on['cpu_pct']:.1f}% CPU{watts}")
+    if package_energy() is None:
+        log("   (power not measured: no readable RAPL counter; on a Pi use a USB power meter)")
+    return results
+
+def script_version():
+    # git describe when run from a checkout, and a hash of this file either way
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.abspath(__file__), "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    try:
+        out = subprocess.run(["git", "-C", here, "describe", "--always", "--dirty"],
+                             capture_output=True, text=True, timeout=5)
+        described = out.stdout.strip() or "-"
+    except (OSError, subprocess.TimeoutExpired):
+        described = "-"
+    return described, digest
+
+def bench_replay(feeds, width, height, framerate, crops, layout, align, geoms, prescale, method, csv_path,
+                 runs=BENCH_REPLAY_RUNS):
+    # Recorded real cabinet content through the full decode/crop/composite path, once per run,
+    # with non-leaky queues so every run composes exactly the same frames. Feeds play as fast
+    # as decoding allows unless one asks for timing=original.
+    played, paced = [], []
+    for f in feeds:
+        u = urllib.parse.urlsplit(f)
+        timing = dict(urllib.parse.parse_qsl(u.query)).get("timing")
+        if u.scheme == "file" and timing is None:
+            f = u._replace(query="&".join(filter(None, (u.query, "timing=fast")))).geturl()
+        elif u.scheme == "file" and timing != "fast":
+            paced.append(f"feed{len(played) + 1}")
+        played.append(f)
+    log(f"⏱️ Replay benchmark: {len(feeds)} feeds into {WINDOW_WIDTH}x{WINDOW_HEIGHT}, {runs} passes"
+        + (f" ({', '.join(paced)} paced at the recorded timing, so fps is capped)" if paced else ""))
+    results = []
+    for k in range(runs):
+        sources = [feed_source(i + 1, f, width, height, framerate, loop=False) for i, f in enumerate(played)]
+        stage = CompositorPipeline(sources, WINDOW_WIDTH, WINDOW_HEIGHT, crops, layout, align, geoms,
+                                   prescale=prescale, method=method, leaky=False)
+        r = stage.benchmark(frames=10 ** 9, timeout=BENCH_REPLAY_TIMEOUT)
+        if "error" in r:
+            log(f"   pass {k + 1} ❌ {r['error']}")
+            return None
+        log(f"   pass {k + 1}: {r['frames']} frames, {r['fps']:7.1f} fps, {r['cpu_ms']:6.2f} ms CPU/frame, "
+            f"{100.0 * r['cpu_ms'] / r['wall_ms']:5.0f}% CPU")
+        results.append(r)
+    r = sorted(results, key=lambda x: x["fps"])[len(results) // 2]
+
+    described, digest = script_version()
+    row = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "version": described, "sha1": digest,
+           "host": os.uname().nodename, "feeds": " ".join(feeds), "window": f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}",
+           "prescale": prescale, "scale_method": method or "", "frames": r["frames"], "fps": f"{r['fps']:.2f}",
+           "wall_ms": f"{r['wall_ms']:.3f}", "cpu_ms": f"{r['cpu_ms']:.3f}",
+           "cpu_pct": f"{100.0 * r['cpu_ms'] / r['wall_ms']:.1f}"}
+    key = ("host", "feeds", "window", "prescale", "scale_method")
+    previous = None
+    try:
+        with open(csv_path, newline="") as f:
+            for old in csv.DictReader(f):
+                if old["sha1"] != digest and all(old[c] == str(row[c]) for c in key):
+                    previous = old
+    except OSError:
+        pass
+    new = not os.path.exists(csv_path)
+    with open(csv_path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(row))
+        if new:
+            writer.writeheader()
+        writer.writerow(row)
+    log(f"✅ {r['fps']:.1f} fps, {r['cpu_ms']:.2f} ms CPU/frame (median pass) -> {csv_path}")
+    if previous:
+        fps_change = 100.0 * (r["fps"] / float(previous["fps"]) - 1)
+        cpu_change = 100.0 * (r["cpu_ms"] / float(previous["cpu_ms"]) - 1)
+        log(f"   vs {previous['version']} ({previous['sha1']}, {previous['time']}): "
+            f"fps {fps_change:+.1f}%, CPU/frame {cpu_change:+.1f}%")
+    return r
+
+
+# ---- Run-time state, set up by main() ----
+# Importing this file has no side effects; the functions, CompositorPipeline and the window
+# read these when they run.
+opts = {}
+settings = {}
+cabinets = []
+windows = [] # Cabinets (BorderlessVideoWindows unless --no-window)
+main_loop = None # GLib.MainLoop with --no-window; Gtk.main() otherwise
+io_modes = {}
+capture_formats = {}
+feed_layout = "auto"
+thread_placement = {}
+rt_priority = 0
+metrics_interval = 0
+prescale_threads = 0 # 0 = compositor scales (default)
+pad_align = 1
+scale_method = None
+stream_size = (WINDOW_WIDTH, WINDOW_HEIGHT)
+stream_kbps = STREAM_KBPS
+thumbnail_width = THUMB_WIDTH
+thumbnail_every = THUMB_INTERVAL
+shm_out_size = (WINDOW_WIDTH, WINDOW_HEIGHT)
+shm_out_format = "BGRx"
+shm_out_slots = SHM_OUT_SLOTS
+
+# Per-feed crop and placement; --cropN/--geomN apply to feed N of every cabinet
+def feed_settings(n):
+    crops = [DEFAULT_CROPS[i] if i < len(DEFAULT_CROPS) else (0, 0, 0, 0) for i in range(n)]
+    geoms = {}
+    for k, v in opts.items():
+        for prefix in ("crop", "geom"):
+            if k.startswith(prefix) and k[len(prefix):].isdigit():
+                i = int(k[len(prefix):]) - 1
+                if not 0 <= i < n:
+                    continue
+                try:
+                    values = [int(x) if prefix == "crop" else float(x) for x in str(v).split(",")]
+                except ValueError:
+                    values = []
+                if prefix == "crop" and len(values) in (2, 4):
+                    crops[i] = tuple(values + [0, 0])[:4]
+                elif prefix == "geom" and len(values) == 4:
+                    geoms[i] = tuple(values)
+                else:
+                    usage = "left,right[,top,bottom] in pixels" if prefix == "crop" else "x,y,w,h as fractions"
+                    raise ValueError(f"--{k}={v}: use --{prefix}N={usage}")
+    return crops, geoms
+
+class Cabinet:
+    # One cabinet's feeds: its CompositorPipeline (start, refresh, standby), capture workers,
+    # overlays, outputs and metrics, all driven from the main loop. On its own it runs
+    # headless (--no-window, no display needed); BorderlessVideoWindow puts it on screen.
+    headless = True
+
+    def __init__(self, devices, name="", monitor=0):
+        self.devices = devices
+        self.name = name
+        self.label = name or "window"
+        self.stage = None # CompositorPipeline on screen
+        self.watched_bus = None # its bus, while on_bus_error is connected
+        self.started = False
+        self.first_frame_at = None
+        self.stream = stream_url(opts["stream"], monitor) if opts.get("stream") else None
+        self.thumbnail = cabinet_path(opts["thumbnail"], "segadoc2in1.jpg", name) if opts.get("thumbnail") else None
+        self.thumbnails_on = True # T; kept across refreshes
+        self.screenshot = None # Screenshot being saved (S)
+        self.shm_out = None # ShmRingWriter, kept across refreshes
+        if opts.get("shm-out"):
+            self.shm_out = ShmRingWriter(cabinet_path(opts["shm-out"], "segadoc2in1-out", name),
+                                         shm_out_caps(*shm_out_size, shm_out_format), shm_out_slots)
+        # --tap: one FrameTap (and worker thread) per plugin, kept across refreshes
+        self.taps = [load_tap(path, opts.get("tap-source"), opts.get("tap-every"))
+                     for path in filter(None, str(opts.get("tap") or "").split(","))] if opts.get("tap") else []
+        self.feed_crops, self.feed_geoms = feed_settings(len(devices))
+        self.metrics = PipelineMetrics(name or "pipeline", 1.0 / int(fps) if opts.get("jitter") else None)
+        self.workers = {} # feed index -> CaptureWorker with --isolate
+        self.closing = self.refreshing = False
+        self.standby = None # pre-built pipeline held in READY (--standby)
+        self.cur_res = (res1, res2)
+        # --replay: one ring per feed, kept across refreshes; P plays replay_feed's ring as PiP
+        self.replay_rings, self.replay_player, self.replay_busy = {}, None, False
+        if opts.get("replay"):
+            seconds = REPLAY_SECONDS if opts["replay"] is True else float(opts["replay"])
+            cap = int(float(opts.get("replay-mb", REPLAY_MAX_MB)) * 1024 * 1024)
+            self.replay_rings = {i: ReplayRing(seconds, cap) for i in range(len(devices))}
+            self.replay_player = ReplayPlayer()
+            self.replay_feed = min(int(opts.get("replay-pip", 1)), len(devices)) - 1
+        # H (--hud): stats overlay, an extra compositor pad after the replay one
+        self.hud, self.hud_since = None, self.metrics.counters()
+        if opts.get("hud"):
+            try:
+                self.hud = StatsHud(self.hud_lines, len(devices) + 2)
+            except ImportError:
+                log("⚠️ The stats overlay needs python3-cairo; H is disabled.")
+        self.overlays = [o for o in (self.replay_player, self.hud) if o]
+        self.base_w, self.base_h = WINDOW_WIDTH, WINDOW_HEIGHT
 
-# Args
-# Notice the spaces betweeen the resolution instead of 1280x720 there is a space. Correct value is 1280 720 or 1920 1080
-# defaults
-# rememb
-video_device1 = f"/dev/{sys.argv[1]}"
-video_device2 = f"/dev/{sys.argv[2]}"
+    # ---- Startup: prepare() on a helper thread while the window maps, then start() ----
+    def prepare(self):
+        # No GTK calls in here: sink lookup, capture workers, parsing the pipeline and opening
+        # the cards overlap with the window being realized and mapped on the main thread.
+        t0 = time.perf_counter()
+        # Choose sink: --sink, remembered benchmark winner, then gtksink > glimagesink > ximagesink
+        self.sink_kind = "fakesink" if self.headless else choose_sink(opts.get("sink"), settings)
+        if not self.sink_kind:
+            raise RuntimeError("no suitable video sink found (need gtksink/glimagesink/ximagesink)")
+        self.log(f"🖥️ Video sink: {self.sink_kind}")
+        try:
+            self._start_workers(res1, res2)
+            for w in self.workers.values():
+                if not w.wait_ready():
+                    raise RuntimeError(f"capture worker for {w.device} did not start")
+            self.stage = self._new_stage(res1, res2)
+            self.stage.build()
+            self.stage.open_sources()
+        except Exception as e:
+            self.log(f"❌ Failed to create pipeline: {e}")
+            raise
+        startup.mark(f"{self.label} pipeline + devices (helper)", t0)
+
+    def start(self):
+        t0 = time.perf_counter()
+        self._adopt(self.stage)
+        if metrics_interval:
+            GLib.timeout_add_seconds(metrics_interval, self.on_metrics_tick)
+        if self.workers:
+            GLib.timeout_add(1000, self.on_worker_watchdog)
+
+        def first_frame(pad, info):
+            GLib.idle_add(self.on_first_frame, t0, time.perf_counter())
+            return Gst.PadProbeReturn.REMOVE
+        self.vsink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, first_frame)
 
-if len(sys.argv) == 4:
-    # form: script videoX videoY fps
-    fps = sys.argv[3]
+        # Embed video
+        self._embed_sink()
+        self.started = True
 
-elif len(sys.argv) == 6:
-    # Could be either: fps width height   OR   width height fps
-    a3, a4, a5 = sys.argv[3], sys.argv[4], sys.argv[5]
-    if a3.isdigit() and int(a3) < 120:  # treat as fps
-        fps = a3
-        res1, res2 = int(a4), int(a5) # set to integers on purpose
+        # ---- Controls ----
+        if self.hud and opts["hud"] != "hidden":
+            self.toggle_hud()
+        self._prepare_standby()
+
+    @property
+    def pipeline(self):
+        return self.stage.pipeline if self.stage else None
+
+    def abandon(self):
+        # a window whose pipeline never started
+        for w in self.workers.values():
+            w.stop()
+        self._unwatch()
+        if self.pipeline:
+            self.pipeline.set_state(Gst.State.NULL)
+        self._destroy_view()
+
+    def on_first_frame(self, t0, at):
+        self.first_frame_at = at
+        startup.mark(f"{self.label} start → first frame", t0)
+        self.log(f"🎬 First frame {(at - T0) * 1000:.0f} ms after script start "
+                 f"({startup.since_launch(at):.0f} ms after process launch).")
+        if opts.get("startup-profile") and all(w.first_frame_at for w in windows):
+            log(startup.report())
+        return False
+
+    # ---- Pipeline description ----
+# res1, res2 and fps are passed in via pipeline
+# default res is 1280x 720 if not specified and fps default is 30 if not specified.
+    def _new_stage(self, width, height):
+        sources = []
+        for i, dev in enumerate(self.devices):
+            fmt = capture_formats.get(dev, "mjpeg") if (width, height) == (res1, res2) else "mjpeg"
+            sources.append(self.workers[i].src_desc() if i in self.workers
+                           else feed_source(i + 1, dev, width, height, fps, io_modes.get(dev, "mmap"), fmt))
+        return CompositorPipeline(sources, self.base_w, self.base_h, self.feed_crops, feed_layout, pad_align,
+                                  self.feed_geoms, self.sink_kind, prescale=prescale_threads, method=scale_method,
+                                  record=opts.get("record"), record_prefix=f"{self.name}-" if self.name else "",
+                                  overlays=self.overlays,
+                                  stream=self.stream, stream_size=stream_size, stream_kbps=stream_kbps,
+                                  thumbnail=self.thumbnail, thumbnail_width=thumbnail_width,
+                                  thumbnail_every=thumbnail_every, shm_out=self.shm_out, taps=self.taps,
+                                  damage=bool(opts.get("damage")))
+
+    # ---- Warm standby (--standby) ----
+    def _prepare_standby(self):
+        if not opts.get("standby") or self.closing:
+            return
+        standby = self._new_stage(*self.cur_res)
+
+        def build():
+            # element creation, plugin lookup and device open happen here, not at switch time
+            t0 = time.perf_counter()
+            try:
+                standby.build()
+                standby.open_sources()
+            except Exception as e:
+                GLib.idle_add(self.log, f"⚠️ Standby pipeline could not be built: {e}")
+                return
+            GLib.idle_add(self._standby_ready, standby, time.perf_counter() - t0)
+
+        threading.Thread(target=build, name="standby-build", daemon=True).start()
+
+    def _standby_ready(self, standby, seconds):
+        if self.closing:
+            set_state_async(standby.pipeline, Gst.State.NULL)
+        else:
+            self.standby = standby
+            self.log(f"🧊 Standby pipeline ready in READY ({seconds * 1000:.0f} ms to build).")
+        return False
+
+    def swap_to_standby(self, reason):
+        standby, self.standby = self.standby, None
+        old = self.pipeline
+        self.refreshing = True
+        t0 = time.perf_counter()
+        self.log(f"🔁 Switching to the standby pipeline ({reason}).")
+        self._unwatch()
+
+        def first_frame(pad, info):
+            ms = (time.perf_counter() - t0) * 1000.0
+            ok = "✅" if ms <= SWITCH_TARGET_MS else "⚠️"
+            GLib.idle_add(self.log, f"{ok} Standby live after {ms:.0f} ms (target {SWITCH_TARGET_MS} ms).")
+            return Gst.PadProbeReturn.REMOVE
+
+        def activate(ok=True, elapsed=0.0):
+            if self.closing:
+                # ESC during the switch: close() stops the old pipeline, the standby is not started
+                set_state_async(standby.pipeline, Gst.State.NULL)
+                return
+            if ok is None:
+                self.log(f"⚠️ Old pipeline not down after {STANDBY_RELEASE_TIMEOUT}s; starting anyway.")
+            self._adopt(standby)
+            self.vsink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, first_frame)
+            self._embed_sink()
+            self.refreshing = False
+            self._prepare_standby() # the next standby
+
+        if self.workers:
+            # shared memory sources can be read twice: start now, tear down in the background
+            activate()
+            set_state_async(old, Gst.State.NULL,
+                            lambda ok, t: self.log(f"⏹️ Old pipeline torn down in {t * 1000:.0f} ms."))
+        else:
+            # a v4l2 card streams to one owner: wait (bounded) for the old pipeline to let go;
+            # set_state_async releases the cards before it finishes any recordings
+            set_state_async(old, Gst.State.NULL, activate, timeout=STANDBY_RELEASE_TIMEOUT)
+
+    # ---- Capture workers (--isolate) ----
+    def _start_workers(self, width, height):
+        # spawns without waiting; prepare() waits on its helper thread, refresh via _when_workers_ready
+        if not opts.get("isolate"):
+            return
+        for w in self.workers.values():
+            w.stop()
+            capture_workers.remove(w)
+        self.workers = {}
+        for i, dev in enumerate(self.devices):
+            if not is_device(dev):
+                continue # URI feeds run in this process
+            fmt = capture_formats[dev] if (width, height) == (res1, res2) else "mjpeg"
+            w = CaptureWorker(i + 1, dev, width, height, fps, io_modes[dev], fmt, thread_placement.get(f"feed{i + 1}"))
+            w.spawn()
+            self.workers[i] = w
+            capture_workers.append(w)
+
+    def _when_workers_ready(self, callback):
+        # callback(error) once every worker's socket is up, polled from the main loop
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+
+        def poll():
+            late = [w for w in self.workers.values() if not w.ready()]
+            if not late:
+                callback(None)
+            elif time.monotonic() > deadline:
+                callback(RuntimeError(f"capture worker for {late[0].device} did not start"))
+            else:
+                return True
+            return False
+
+        if poll():
+            GLib.timeout_add(50, poll)
+
+    def on_worker_watchdog(self):
+        if self.pipeline is None:
+            return False
+        now = time.monotonic()
+        for i, w in self.workers.items():
+            if w.pending:
+                if w.ready():
+                    # reconnect only this branch; the compositor keeps showing the other feeds
+                    w.pending = False
+                    src = self.pipeline.get_by_name(f"src{i + 1}")
+                    src.set_state(Gst.State.NULL)
+                    src.sync_state_with_parent()
+                    self.log(f"✅ feed{i + 1} worker reconnected (restart #{w.restarts})")
+                elif now - w.started > WORKER_START_TIMEOUT:
+                    self.log(f"⚠️ feed{i + 1} worker did not come back; respawning again")
+                    w.respawn()
+                continue
+            last = max(self.metrics.last_feed[i], w.started)
+            if not w.alive() or now - last > WORKER_STALL_TIMEOUT:
+                why = "exited" if not w.alive() else f"delivered no frames for {now - last:.1f}s"
+                self.log(f"⚠️ feed{i + 1} worker {why}; killing and respawning")
+                w.respawn()
+        return True
+
+    # ---- Putting a pipeline on screen ----
+    def _adopt(self, stage):
+        # window-side wiring of a built CompositorPipeline: layout, worker EOS handling,
+        # metrics and bus watches
+        self.stage = stage
+        self.vsink = stage.vsink
+        stage.resize(self.base_w, self.base_h)
+        n = len(self.devices)
+        # the fine tuning sliders address the first two feeds by name
+        self.crop1, self.pad1 = stage.crops[0], stage.pads[0]
+        if n >= 2:
+            self.crop2, self.pad2 = stage.crops[1], stage.pads[1]
+        for i in self.workers:
+            stage.pipeline.get_by_name(f"src{i + 1}").get_static_pad("src").add_probe(
+                Gst.PadProbeType.EVENT_DOWNSTREAM, drop_eos)
+            if stage.pads[i].find_property("repeat-after-eos"):
+                stage.pads[i].set_property("repeat-after-eos", True)
+        for i, ring in self.replay_rings.items():
+            dec = stage.pipeline.get_by_name(f"dec{i + 1}")
+            if dec:
+                # the pad feeding jpegdec: its probes run before --damage drops repeats
+                ring.attach(dec.get_static_pad("sink").get_peer())
+            else:
+                self.log(f"⚠️ feed{i + 1} is captured raw; it has no replay.")
+        if self.replay_player:
+            self.replay_player.stop()
+            self.place_replay(False)
+        if self.hud:
+            self.hud.use(stage.pipeline.get_by_name(f"overlay{self.overlays.index(self.hud) + 1}"))
+            self.place_hud()
+        stage.thumbnails_on = bool(self.thumbnail) and self.thumbnails_on
+        self.metrics.attach(stage.pipeline, n)
+        stage.on_repeat = self.metrics.count_feed # a --damage repeat still is a frame from the feed
+        stage.attach_outputs() # takes the ring and taps over from the pipeline it replaces
+        bus = stage.pipeline.get_bus()
+        bus.add_signal_watch()
+        self.watched_bus = bus
+        bus.connect("message::error", self.on_bus_error)
+        if thread_placement or rt_priority:
+            bus.enable_sync_message_emission()
+            bus.connect("sync-message::stream-status", self.on_stream_status)
+
+    def _unwatch(self):
+        # the pipeline on screen is being retired: its bus watch goes, exactly once
+        if self.watched_bus:
+            self.watched_bus.remove_signal_watch()
+            self.watched_bus = None
+
+    # ---- Instant replay (--replay) ----
+    def place_replay(self, visible):
+        pad = self.stage.overlay_pads[self.overlays.index(self.replay_player)]
+        w, h = self.base_w // REPLAY_PIP_FRACTION, self.base_h // REPLAY_PIP_FRACTION
+        pad.set_property("xpos", self.base_w - w - REPLAY_PIP_MARGIN)
+        pad.set_property("ypos", self.base_h - h - REPLAY_PIP_MARGIN)
+        pad.set_property("width", w)
+        pad.set_property("height", h)
+        pad.set_property("alpha", 1.0 if visible else 0.0)
+        self.stage.invalidate()
+
+    def toggle_replay(self):
+        if self.replay_player.frames is not None:
+            self.replay_player.stop()
+            self.place_replay(False)
+            self.log("⏹️ Replay picture-in-picture off.")
+            return
+        frames = self.replay_rings[self.replay_feed].snapshot()
+        if not frames:
+            self.log(f"⚠️ Nothing to replay yet for feed{self.replay_feed + 1}.")
+            return
+        self.place_replay(True)
+        self.replay_player.play(frames, self.pipeline.get_by_name(f"overlay{self.overlays.index(self.replay_player) + 1}"))
+        self.log(f"⏪ Replaying feed{self.replay_feed + 1}: {frames[-1][0] - frames[0][0]:.1f} s, "
+                 f"{len(frames)} frames (P to hide).")
+
+    def dump_replay(self):
+        # snapshots are taken now; writing them happens on a worker thread
+        if self.replay_busy:
+            self.log("⏳ Still writing the previous replay.")
+            return
+        folder = opts.get("replay-dir") or opts.get("record") or os.path.expanduser("~/segadoc2in1-replays")
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        prefix = f"{self.name}-" if self.name else ""
+        shots = {i: ring.snapshot() for i, ring in self.replay_rings.items()}
+        self.replay_busy = True
+
+        def write():
+            lines = []
+            try:
+                os.makedirs(folder, exist_ok=True)
+                for i, frames in shots.items():
+                    if not frames:
+                        continue
+                    t0 = time.perf_counter()
+                    secs = frames[-1][0] - frames[0][0]
+                    rate = round((len(frames) - 1) / secs) if secs > 0 else 0
+                    path = os.path.join(folder, f"replay-{prefix}feed{i + 1}-{stamp}-{rate}fps.mjpeg")
+                    write_replay(frames, path)
+                    mb = sum(len(d) for _, d in frames) / 1e6
+                    lines.append(f"💾 Replay feed{i + 1}: {secs:.1f} s, {len(frames)} frames, {mb:.0f} MB "
+                                 f"written in {time.perf_counter() - t0:.2f} s -> {path}")
+            except OSError as e:
+                lines.append(f"❌ Replay could not be written: {e}")
+            GLib.idle_add(self._replay_written, lines)
+
+        threading.Thread(target=write, name="replay-writer", daemon=True).start()
+
+    def _replay_written(self, lines):
+        self.replay_busy = False
+        for line in lines:
+            self.log(line)
+        return False
+
+    # ---- Stats overlay (H) ----
+    def hud_lines(self):
+        if time.monotonic() - self.hud_since["t"] < 0.25:
+            return [f"{self.label}: measuring…"] # just shown; rates need an interval
+        self.hud_since, r = self.metrics.rates(self.hud_since)
+        lines = [f"{self.label}: {r['out']:.1f} fps out, CPU {r['cpu']:.0f}% ({os.cpu_count()} cores)"]
+        for i, (f, d, l) in enumerate(zip(r["feeds"], r["drops"], r["latency_ms"])):
+            lines.append(f"feed{i + 1}: {f:5.1f} fps {d:3d} drops {l:4.0f} ms")
+        stall = f", worst UI stall {ui_stats.worst_stall_ms:.0f} ms" if ui_stats.last_beat is not None else ""
+        lines.append(f"errors {self.metrics.errors}{stall}")
+        return lines
+
+    def place_hud(self):
+        pad = self.stage.overlay_pads[self.overlays.index(self.hud)]
+        pad.set_property("xpos", HUD_MARGIN)
+        pad.set_property("ypos", HUD_MARGIN)
+        pad.set_property("width", self.hud.width)
+        pad.set_property("height", self.hud.height)
+        pad.set_property("alpha", 1.0 if self.hud.visible else 0.0)
+        self.stage.invalidate()
+
+    def toggle_hud(self):
+        if not self.hud.visible:
+            self.hud_since = self.metrics.counters() # rates from now, not since start
+        self.hud.show(not self.hud.visible)
+        self.place_hud()
+
+    # ---- Screenshots (S) ----
+    def take_screenshot(self):
+        if self.screenshot:
+            self.screenshot.press()
+            return
+        folder = opts.get("screenshot-dir") or os.path.expanduser("~/segadoc2in1-screenshots")
+        self.screenshot = Screenshot(self.stage, folder, f"{self.name}-" if self.name else "",
+                                     opts.get("screenshot-format", "png"))
+        self.screenshot.start(self._screenshot_saved)
+
+    def _screenshot_saved(self, lines):
+        self.screenshot = None
+        for line in lines:
+            self.log(line)
+        return False
+
+    # ---- Front-end hooks: headless, the pipeline just plays; BorderlessVideoWindow shows it ----
+    def _embed_sink(self):
+        self._set_state(Gst.State.PLAYING)
+
+    def _hide_view(self):
+        pass
+
+    def _destroy_view(self):
+        pass
+
+    def log(self, message):
+        log(f"[{self.name}] {message}" if self.name else message)
+
+    # ---- Errors and metrics ----
+    def on_bus_error(self, bus, message):
+        # Only this cabinet stops; the others keep running. R restarts it.
+        err, debug = message.parse_error()
+        self.metrics.errors += 1
+        src = message.src.get_name() if message.src else "pipeline"
+        self.log(f"❌ Pipeline error from {src}: {err.message}")
+        if debug:
+            self.log(f"   {debug}")
+        if self.pipeline is None:
+            return
+        m = re.fullmatch(r"src(\d+)", src)
+        if m and int(m.group(1)) - 1 in self.workers:
+            # lost the worker's shared memory: respawn that worker, keep the display running
+            w = self.workers[int(m.group(1)) - 1]
+            if not w.pending:
+                w.respawn()
+            return
+        dev = self.devices[int(m.group(1)) - 1] if m and int(m.group(1)) <= len(self.devices) else None
+        if dev in io_modes and io_modes[dev] != "mmap" and opts.get("io-mode", "auto") == "auto" \
+                and not self.refreshing:
+            # the remembered (or probed) io-mode does not run here: forget it and retry with mmap
+            self.log(f"⚠️ io-mode {io_modes[dev]} failed on {dev}, falling back to mmap")
+            forget_io_mode(dev, res1, res2, fps, settings)
+            io_modes[dev] = "mmap"
+            self.refresh_pipeline()
+            return
+        if self.standby and not self.refreshing:
+            self.swap_to_standby(f"error from {src}")
+            return
+        self._set_state(Gst.State.NULL)
+
+    def on_stream_status(self, bus, message):
+        # runs in the thread that posted the message
+        status, owner = message.parse_stream_status()
+        if status == Gst.StreamStatusType.ENTER and owner:
+            place_streaming_thread(owner.get_name(), thread_placement, rt_priority)
+
+    def output_report(self):
+        # recordings, stream, thumbnails, shared memory ring and analytics taps since the last report
+        return (self.stage.recording_report() + self.stage.stream_report() + self.stage.thumbnail_report() +
+                (self.shm_out.report() if self.shm_out else []) + [l for t in self.taps for l in t.report()] +
+                self.stage.damage_report())
+
+    def on_metrics_tick(self):
+        if self.pipeline is None:
+            return False
+        log(self.metrics.report())
+        for line in self.output_report():
+            self.log(line)
+        if self is windows[0]:
+            log(ui_stats.report())
+        return True
+
+    # ---- State changes, off the main thread ----
+    def _set_state(self, state):
+        target = state.value_nick.upper()
+
+        def done(ok, elapsed):
+            if ok is None:
+                self.log(f"⚠️ Pipeline did not reach {target} within {STATE_TIMEOUT}s")
+            elif not ok:
+                self.log(f"❌ Pipeline failed to change to {target}")
+
+        set_state_async(self.pipeline, state, done)
+
+    def close(self, reason="ESC key pressed"):
+        if self.closing:
+            return
+        self.closing = True
+        self.log(f"🛑 {reason}. Exiting preview window.")
+        if self.hud:
+            self.hud.show(False) # its redraw timer would keep pushing into a stopping pipeline
+        if self.metrics.jitter:
+            log(self.metrics.jitter_report())
+        for line in self.output_report():
+            self.log(line)
+        # the window goes away at once; the devices are released in the background
+        self._hide_view()
+        self._unwatch()
+        self.stage.detach_outputs() # nothing is published while it stops, even if it never does
+        pipeline, self.stage = self.pipeline, None
+        if self.standby:
+            set_state_async(self.standby.pipeline, Gst.State.NULL)
+            self.standby = None
+
+        def stopped(ok, elapsed):
+            if ok is None:
+                self.log(f"⚠️ Pipeline did not stop within {STATE_TIMEOUT}s; abandoning it.")
+            else:
+                self.log(f"⏹️ Pipeline stopped in {elapsed * 1000:.0f} ms.")
+            for w in self.workers.values():
+                w.stop()
+            if self.shm_out and ok is not None:
+                self.shm_out.close() # a stuck streaming thread may still be inside a write
+            windows.remove(self)
+            self._destroy_view()
+            if not windows:
+                log(ui_stats.report())
+                if ok is None:
+                    # a streaming thread is stuck in the driver; do not hang on interpreter exit
+                    for w in capture_workers:
+                        w.stop()
+                    os._exit(0)
+                if main_loop:
+                    main_loop.quit() # --no-window
+                else:
+                    Gtk.main_quit()
+
+        set_state_async(pipeline, Gst.State.NULL, stopped)
 
+    def refresh_pipeline(self):
+        if self.refreshing or self.pipeline is None:
+            return
+        self.refreshing = True
+        # Stop current pipeline in the background, build the new one when it is down
+        old = self.pipeline
+        self._unwatch()
+
+        def stopped(ok, elapsed):
+            if ok is None:
+                self.log(f"⚠️ Old pipeline did not stop within {STATE_TIMEOUT}s; starting the new one anyway.")
+
+            def build(error):
+                if self.closing:
+                    for w in self.workers.values():
+                        w.stop()
+                    return
+                try:
+                    if error:
+                        raise error
+                    stage = self._new_stage(*self.cur_res)
+                    stage.build()
+
+                    # Re-grab elements and pads, reapply defaults: half-split view
+                    self._adopt(stage)
+
+                    # Re-embed the new sink and start pipeline again
+                    self._embed_sink()
+                    self.log(f"✅ Pipeline refreshed successfully (old one stopped in {elapsed * 1000:.0f} ms).")
+                except Exception as e:
+                    self.log(f"❌ Refresh failed: {e}")
+                self.refreshing = False
+                self._prepare_standby()
+
+            if self.closing:
+                return # ESC while the old pipeline was stopping: do not open the cards again
+# Leave values as is so this can reset to default. Next, the operator restarts.
+            self.cur_res = (1280, 720)
+            # workers start without blocking the main loop; the stage is built once they are up
+            self._start_workers(*self.cur_res)
+            self._when_workers_ready(build)
 
-# Check video devices exist. if not, msg to operator and exit
-for p in (video_device1, video_device2):
-    if not os.path.exists(p):
-        log(f"❌ Error: Device {p} not found.")
-        sys.exit(1)
+        set_state_async(old, Gst.State.NULL, stopped)
 
-# passed edits and logic fell thru. logging the start.
-log(f"✅ Starting preview for devices: {video_device1}, {video_device2}")
 
-# GTK / GStreamer init
-Gst.init(None)
-Gtk.init(None)
+class BorderlessVideoWindow(Cabinet):
+    # A cabinet on screen: a borderless GTK window with the video sink embedded, the hotkeys
+    # and resize handling. Mixed into Gtk.Window by video_window() once GTK is imported.
+    headless = False
 
-class BorderlessVideoWindow(Gtk.Window):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, devices, name="", monitor=0):
+        Gtk.Window.__init__(self)
+        t0 = time.perf_counter()
+        Cabinet.__init__(self, devices, name, monitor)
         self.set_decorated(False)
         self.set_app_paintable(True)
         self.set_default_size(WINDOW_WIDTH, WINDOW_HEIGHT)
         self.set_resizable(True)         # allow maximize
-        self.move(WINDOW_X, WINDOW_Y)
+        # with several cabinets each window goes to its own monitor when there is one
+        mon = Gdk.Display.get_default().get_monitor(monitor) if monitor else None
+        origin = mon.get_geometry() if mon else None
+        self.move(WINDOW_X + (origin.x if origin else 0), WINDOW_Y + (origin.y if origin else 0))
         self.connect("key-press-event", self.on_key_press)
         self.connect("configure-event", self.on_resize)
-        self.base_w, self.base_h = WINDOW_WIDTH, WINDOW_HEIGHT
+        self.connect("map-event", self.on_mapped, t0)
 
         # Layout: video on top, sliders below
         self.vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
         self.add(self.vbox)
         self.show_all()
+        startup.mark(f"{self.label} shown", t0)
 
-        # Choose sink: gtksink > glimagesink > ximagesink
-        self.sink_kind = None
-        for cand in ("gtksink", "glimagesink", "ximagesink"):
-            if Gst.ElementFactory.find(cand):
-                self.sink_kind = cand; break
-        if not self.sink_kind:
-            log("❌ No suitable video sink found (need gtksink/glimagesink/ximagesink).")
-            sys.exit(1)
+    def _hide_view(self):
+        self.hide()
 
-        sink_desc = (
-            "gtksink name=vsink" if self.sink_kind == "gtksink"
-            else "glimagesink name=vsink sync=false"
-            if self.sink_kind == "glimagesink"
-            else "ximagesink name=vsink sync=false"
-        )
+    def _destroy_view(self):
+        self.destroy()
 
-        # >>> Merged change: scale each feed to half width and use transparent background
-        half_w = WINDOW_WIDTH // 2
+    def on_mapped(self, widget, event, t0):
+        startup.mark(f"{self.label} mapped", t0)
+        return False
 
-# res1, res2 and fps are passed in via pipeline
-# default res is 1280x 720 if not specified and fps default is 30 if not specified.
-        pipeline_str = f"""
-        compositor name=comp latency=0 background=transparent ! \
-            gtksink name=vsink \
-        v4l2src device={video_device1} io-mode=2 do-timestamp=true ! \
-            image/jpeg,width={res1},height={res2},framerate={fps}/1 ! jpegdec ! \
-            videocrop name=crop1 left=40 right=53 ! \
-            queue max-size-buffers=1 max-size-bytes=0 max-size-time=0 leaky=downstream ! comp.sink_0 \
-        v4l2src device={video_device2} io-mode=2 do-timestamp=true ! \
-            image/jpeg,width={res1},height={res2},framerate={fps}/1 ! jpegdec ! \
-            videocrop name=crop2 left=44 right=52 ! \
-            queue max-size-buffers=1 max-size-bytes=0 max-size-time=0 leaky=downstream ! comp.sink_1
-        """
-        
-        try:
-            self.pipeline = Gst.parse_launch(pipeline_str)
-        except Exception as e:
-            log(f"❌ Failed to create pipeline: {e}"); sys.exit(1)
+    def on_key_press(self, widget, event):
+        if not self.started:
+            return # still starting up
+        if event.keyval == Gdk.KEY_Escape:
+            self.close()
+        elif event.keyval == Gdk.KEY_r:   # 🔄 Refresh pipeline
+            self.log("🔄 R key pressed. Refreshing pipeline...")
+            if self.standby and not self.refreshing:
+                self.swap_to_standby("R key")
+            else:
+                self.refresh_pipeline()
+        elif event.keyval == Gdk.KEY_b and self.replay_rings:   # 💾 save the replay rings
+            self.dump_replay()
+        elif event.keyval == Gdk.KEY_p and self.replay_player:  # ⏪ replay picture-in-picture
+            self.toggle_replay()
+        elif event.keyval == Gdk.KEY_h and self.hud:            # 📊 stats overlay
+            self.toggle_hud()
+        elif event.keyval == Gdk.KEY_s:                         # 📸 screenshot of the composite and the feeds
+            self.take_screenshot()
+        elif event.keyval == Gdk.KEY_t and self.thumbnail:      # 🖼️ dashboard thumbnails on/off
+            self.thumbnails_on = self.stage.thumbnails_on = not self.thumbnails_on
+            self.log(f"🖼️ Thumbnails {'on' if self.thumbnails_on else 'off'} ({self.thumbnail}).")
+        ui_stats.key_handled(event)
 
-        self.vsink = self.pipeline.get_by_name("vsink")
-        self.compositor = self.pipeline.get_by_name("comp")
-        self.crop1 = self.pipeline.get_by_name("crop1")
-        self.crop2 = self.pipeline.get_by_name("crop2")
+    # ---- Resize handling ----
+    def on_resize(self, widget, event):
+        alloc = widget.get_allocation()
+        if (alloc.width, alloc.height) == (self.base_w, self.base_h):
+            return # configure-event also fires on moves
+        self.base_w, self.base_h = alloc.width, alloc.height
+        if self.stage:
+            self.stage.resize(self.base_w, self.base_h)
+            if self.replay_player:
+                self.place_replay(self.replay_player.frames is not None)
 
-        # Embed video
+    # ---- Embedding ----
+    def _embed_sink(self):
         if self.sink_kind == "gtksink":
             try:
                 sink_widget = self.vsink.get_property("widget")
             except Exception:
                 sink_widget = None
             if sink_widget:
+                # a refreshed pipeline brings a new widget; drop the old one
+                if getattr(self, "video_widget", None):
+                    self.vbox.remove(self.video_widget)
+                self.video_widget = sink_widget
                 self.vbox.pack_start(sink_widget, True, True, 0)
                 self.show_all()
                 try: self.vsink.set_property("force-aspect-ratio", False)
                 except Exception: pass
-                self.pipeline.set_state(Gst.State.PLAYING)
-            else:
-                self._embed_with_handle()
+                self._set_state(Gst.State.PLAYING)
+                return
+        self._embed_with_handle()
+
+    # ---- Embedding for non-gtksink ----
+    def _embed_with_handle(self):
+        if not hasattr(self, "drawing_area"):
+            self.drawing_area = Gtk.DrawingArea()
+            self.vbox.pack_start(self.drawing_area, True, True, 0)
+            self.show_all()
+        try: self.vsink.set_property("force-aspect-ratio", False)
+        except Exception: pass
+
+        bus = self.pipeline.get_bus()
+        bus.enable_sync_message_emission()
+        bus.connect("sync-message::element", self.on_sync_message)
+
+        # the window is already shown, so the area is usually realized by now
+        if self.drawing_area.get_realized():
+            self.on_realize(self.drawing_area)
         else:
-            self._embed_with_handle()
+            self.drawing_area.connect("realize", self.on_realize)
 
-        # ---- Controls ----
-        sinkpads = self.compositor.sinkpads
-        if len(sinkpads) >= 2:
-            self.pad1 = sinkpads[0]
-            self.pad2 = sinkpads[1]
-
-# Positioning of windows
-
-            w0 = self.base_w // 2
-            w1 = self.base_w - w0
-            h  = self.base_h
-
-            # >>> Merged change: feed1 left half, feed2 right half
-
-            # feed1 on the left
-            self.pad1.set_property("xpos", 0)
-            self.pad1.set_property("ypos", 0)
-            self.pad1.set_property("width", self.base_w // 2)
-            self.pad1.set_property("height", self.base_h)
-
-            # feed2 on the right
-            self.pad2.set_property("xpos", self.base_w // 2)
-            self.pad2.set_property("ypos", 0)
-            self.pad2.set_property("width", self.base_w // 2)
-            self.pad2.set_property("height", self.base_h)
-
-###
-#            # Start both feeds full-window
-            self.pad1.set_property("xpos", 0); self.pad1.set_property("ypos", 0)
-            self.pad2.set_property("xpos", 0); self.pad2.set_property("ypos", 0)
-#
-#            self.pad1.set_property("width", self.base_w); self.pad1.set_property("height", self.base_h)
- #           self.pad2.set_property("width", self.base_w); self.pad2.set_property("height", self.base_h)
-####
-
-        w0 = self.base_w // 2
-        w1 = self.base_w - w0
-        h  = self.base_h
-
-        # feed1 on the left
-        self.pad1.set_property("xpos", 0)
-        self.pad1.set_property("ypos", 0)
-        self.pad1.set_property("width", w0)
-        self.pad1.set_property("height", h)
-
-        # feed2 on the right
-        self.pad2.set_property("xpos", w0)
-        self.pad2.set_property("ypos", 0)
-        self.pad2.set_property("width", w1)
-        self.pad2.set_property("height", h)
-
-# Uncomment for fine tuning
+    def on_realize(self, widget):
+        window = widget.get_window()
+        if window and self.vsink:
+            xid = window.get_xid()
+            try: self.vsink.set_window_handle(xid)
+            except Exception: pass
+            self._set_state(Gst.State.PLAYING)
+
+    def on_sync_message(self, bus, message):
+        st = message.get_structure()
+        if st and st.get_name() == "prepare-window-handle":
+            if hasattr(self, "drawing_area"):
+                window = self.drawing_area.get_window()
+                if window:
+                    try: message.src.set_window_handle(window.get_xid())
+                    except Exception: pass
+
+    # ---- UI helper ----
+# Uncomment for fine tuning (in start(), after _adopt)
             # Feed1 sliders
 #        self.add_slider("Feed1 X", 0, self.base_w, 0, self.on_x1)
 #        self.add_slider("Feed1 Y", 0, self.base_h, 0, self.on_y1)
@@ -263,7 +3200,7 @@ class BorderlessVideoWindow(Gtk.Window):
 #         self.add_slider("Feed1 Crop Bottom", 0, 300, 0, self.on_c1_bottom)
 # 
             # Feed2 sliders
-#        self.add_slider("Feed2 X", 0, self.base_w, w0, self.on_x2)
+#        self.add_slider("Feed2 X", 0, self.base_w, self.base_w // 2, self.on_x2)
 #        self.add_slider("Feed2 Y", 0, self.base_h, 0, self.on_y2)
 #        self.add_slider("Feed2 Zoom", 0.5, 2.0, 1.0, self.on_zoom2, step=0.01)
 #        self.add_slider("Feed2 Alpha", 0.0, 1.0, 1.0, self.on_a2, step=0.01)
@@ -273,7 +3210,6 @@ class BorderlessVideoWindow(Gtk.Window):
 #        self.add_slider("Feed2 Crop Top", 0, 300, 0, self.on_c2_top)
 #        self.add_slider("Feed2 Crop Bottom", 0, 300, 0, self.on_c2_bottom)
 
-    # ---- UI helper ----
     def add_slider(self, label, minv, maxv, initv, cb, step=1):
         row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
         lbl = Gtk.Label(label); lbl.set_xalign(0.0)
@@ -350,126 +3286,286 @@ class BorderlessVideoWindow(Gtk.Window):
         self.crop2.set_property("bottom", val)
         log(f"Feed2 Crop Bottom = {val}")
 
-    # ---- Resize handling ----
-    def on_resize(self, widget, event):
-        alloc = widget.get_allocation()
-        self.base_w, self.base_h = alloc.width, alloc.height
-        if hasattr(self, "pad1") and hasattr(self, "pad2"):
-            half_w = self.base_w // 2
-            self.pad1.set_property("xpos", 0)
-            self.pad1.set_property("ypos", 0)
-            self.pad1.set_property("width", half_w)
-            self.pad1.set_property("height", self.base_h)
-
-            self.pad2.set_property("xpos", half_w)
-            self.pad2.set_property("ypos", 0)
-            self.pad2.set_property("width", self.base_w - half_w)
-            self.pad2.set_property("height", self.base_h)
-
-    # ---- Embedding for non-gtksink ----
-    def _embed_with_handle(self):
-        self.drawing_area = Gtk.DrawingArea()
-        self.vbox.pack_start(self.drawing_area, True, True, 0)
-        self.show_all()
-        try: self.vsink.set_property("force-aspect-ratio", False)
-        except Exception: pass
-
-        self.pipeline.set_state(Gst.State.READY)
-        self.drawing_area.connect("realize", self.on_realize)
-
-        bus = self.pipeline.get_bus()
-        bus.enable_sync_message_emission()
-        bus.connect("sync-message::element", self.on_sync_message)
-
-    def on_realize(self, widget):
-        window = widget.get_window()
-        if window and self.vsink:
-            xid = window.get_xid()
-            try: self.vsink.set_window_handle(xid)
-            except Exception: pass
-            self.pipeline.set_state(Gst.State.PAUSED)
-            self.pipeline.set_state(Gst.State.PLAYING)
+VideoWindow = None # BorderlessVideoWindow + Gtk.Window, made by video_window()
+
+def video_window(devices, name="", monitor=0):
+    global VideoWindow
+    if VideoWindow is None:
+        import_gtk()
+        VideoWindow = type("BorderlessVideoWindow", (BorderlessVideoWindow, Gtk.Window), {})
+    return VideoWindow(devices, name, monitor)
+
+
+def main():
+    global opts, settings, cabinets, windows, io_modes, capture_formats, feed_layout, thread_placement
+    global rt_priority, metrics_interval, prescale_threads, pad_align, scale_method, fps, res1, res2
+    global stream_size, stream_kbps, thumbnail_width, thumbnail_every, shm_out_size, shm_out_format, shm_out_slots
+    global main_loop
+    # Options: --name or --name=value, anywhere on the command line
+    startup.mark("gi imports", T0)
+    if Gst is None:
+        log("❌ GStreamer's Python bindings are missing (sudo apt install python3-gi gir1.2-gstreamer-1.0).")
+        sys.exit(1)
+    t_phase = time.perf_counter()
+    opts = {}
+    args = [sys.argv[0]]
+    for a in sys.argv[1:]:
+        if a.startswith("--"):
+            k, _, v = a[2:].partition("=")
+            opts[k] = v if v else True
+        else:
+            args.append(a)
+
+    # Args
+    # Notice the spaces betweeen the resolution instead of 1280x720 there is a space. Correct value is 1280 720 or 1920 1080
+    # defaults
+    # rememb
+    # Devices are the non-numeric arguments, numbers are fps / resolution
+    video_devices = [feed_spec(a) for a in args[1:] if not a.isdigit()]
+    nums = [a for a in args[1:] if a.isdigit()]
+
+    if len(nums) == 1:
+        # form: script videoX videoY ... fps
+        fps = nums[0]
+
+    elif len(nums) == 3:
+        # Could be either: fps width height   OR   width height fps
+        a3, a4, a5 = nums
+        if a3.isdigit() and int(a3) < 120:  # treat as fps
+            fps = a3
+            res1, res2 = int(a4), int(a5) # set to integers on purpose
+
+    # Cabinets: each group of devices gets its own pipeline and window
+    if opts.get("cabinets"):
+        groups = re.split(r":(?!//)", opts["cabinets"]) # a ':' that is not part of a URI scheme
+        cabinets = [[feed_spec(d) for d in group.split(",") if d] for group in groups]
+        cabinets = [c for c in cabinets if c]
+    else:
+        cabinets = [video_devices]
+    all_devices = [d for c in cabinets for d in c]
+
+    if not all_devices:
+        log("❌ Usage: SEGADOC2in1Video.py video# video# [video# ...] [fps] [width height]")
+        sys.exit(1)
+    if len(set(all_devices)) != len(all_devices):
+        log("❌ Error: a device is listed in more than one cabinet.")
+        sys.exit(1)
 
-    def on_sync_message(self, bus, message):
-        st = message.get_structure()
-        if st and st.get_name() == "prepare-window-handle":
-            if hasattr(self, "drawing_area"):
-                window = self.drawing_area.get_window()
-                if window:
-                    try: message.src.set_window_handle(window.get_xid())
-                    except Exception: pass
+    # Check video devices exist. if not, msg to operator and exit
+    for p in filter(is_device, all_devices):
+        if not os.path.exists(p):
+            log(f"❌ Error: Device {p} not found.")
+            sys.exit(1)
 
-    def on_key_press(self, widget, event):
-        if event.keyval == Gdk.KEY_Escape:
-            log("🛑 ESC key pressed. Exiting preview window.")
-            self.pipeline.set_state(Gst.State.NULL)
-            Gtk.main_quit()
-        elif event.keyval == Gdk.KEY_r:   # 🔄 Refresh pipeline
-            log("🔄 R key pressed. Refreshing pipeline...")
-            self.refresh_pipeline()
+    try:
+        for c in cabinets:
+            feed_settings(len(c))
+    except ValueError as e:
+        log(f"❌ Usage: {e}")
+        sys.exit(1)
 
-    def refresh_pipeline(self):
+    feed_layout = opts.get("layout", "auto")
+    thread_placement = parse_affinity(opts.get("affinity"))
+    rt_priority = int(opts.get("rt-priority", 0))
+    if "main" in thread_placement:
+        # threads created later inherit this mask until placed themselves
+        os.sched_setaffinity(0, thread_placement["main"])
+        log(f"📌 GTK main thread on CPUs {sorted(thread_placement['main'])}")
+    metrics_interval = 0
+    if opts.get("metrics") or len(cabinets) > 1:
+        metrics_interval = METRICS_INTERVAL if opts.get("metrics") in (None, True) else int(opts["metrics"])
+
+    # passed edits and logic fell thru. logging the start.
+    for c in cabinets:
+        log(f"✅ Starting preview for devices: {', '.join(c)}")
+
+    startup.mark("options + device checks", t_phase)
+
+    settings = load_settings()
+    if not opts.get("warm-registry") and not opts.get("full-registry"):
+        use_plugin_cache(settings)
+
+    # GTK / GStreamer init: loading the GStreamer registry runs on a helper thread while GTK
+    # connects to the display
+    def gst_init():
+        t = time.perf_counter()
+        Gst.init(None)
+        startup.mark("Gst.init (helper thread)", t)
+
+    gst_init_thread = threading.Thread(target=gst_init, name="gst-init")
+    gst_init_thread.start()
+    headless = bool(opts.get("no-window"))
+    if not headless:
+        # --no-window needs no display: GTK is never initialised
+        t_phase = time.perf_counter()
+        import_gtk()
+        Gtk.init(None)
+        startup.mark("Gtk.init", t_phase)
+    gst_init_thread.join()
+
+    t_phase = time.perf_counter()
+    if opts.get("warm-registry"):
+        warm_registry(settings)
+        sys.exit(0)
+    if opts.get("bench-sinks"):
+        bench_sinks(WINDOW_WIDTH, WINDOW_HEIGHT, fps, settings)
+
+    prescale_threads = 0 # 0 = compositor scales (default)
+    if opts.get("prescale") or opts.get("bench-prescale"):
+        prescale_threads = PRESCALE_THREADS if opts.get("prescale") in (None, True) else int(opts["prescale"])
+        if not prescale_supported():
+            log("⚠️ videoscale has no n-threads property (GStreamer < 1.20); prescale disabled.")
+            prescale_threads = 0
+    if opts.get("bench-prescale"):
+        if not prescale_threads:
+            log("❌ Prescale is not supported here, so there is nothing to benchmark.")
+            sys.exit(1)
+        log(f"⏱️ Prescale benchmark: 2 x 1920x1080 -> {WINDOW_WIDTH}x{WINDOW_HEIGHT}, {prescale_threads} threads/feed")
+        bench_prescale(WINDOW_WIDTH, WINDOW_HEIGHT, fps, prescale_threads)
+        sys.exit(0)
+
+    pad_align = int(opts.get("align", 1))
+    scale_method = opts.get("scale-method") or settings.get("scale_method")
+    if scale_method and scale_method not in SCALE_METHODS:
+        log(f"❌ Unknown scale method {scale_method} (use {', '.join(SCALE_METHODS)}).")
+        sys.exit(1)
+    if opts.get("scale-method") and opts["scale-method"] != settings.get("scale_method"):
+        settings["scale_method"] = opts["scale-method"]
+        save_settings(settings)
+    if opts.get("bench-scale"):
+        sizes = [(WINDOW_WIDTH, WINDOW_HEIGHT)]
+        display = Gdk.Display.get_default() if Gdk else None # not with --no-window
+        monitor = display.get_monitor(0) if display else None
+        if monitor:
+            geo = monitor.get_geometry()
+            if (geo.width, geo.height) not in sizes:
+                sizes.append((geo.width, geo.height))
+        bench_scale_methods(sizes, fps, pad_align)
+        sys.exit(0)
+    if opts.get("bench-feeds"):
+        bench_feed_counts(WINDOW_WIDTH, WINDOW_HEIGHT, fps, pad_align)
+        sys.exit(0)
+    if opts.get("shm-out") or opts.get("bench-shm-out"):
         try:
-            # Stop current pipeline
-            self.pipeline.set_state(Gst.State.NULL)
-
-            # Rebuild pipeline string
-            sink_desc = (
-                "gtksink name=vsink" if self.sink_kind == "gtksink"
-                else "glimagesink name=vsink sync=false"
-                if self.sink_kind == "glimagesink"
-                else "ximagesink name=vsink sync=false"
-            )
+            if opts.get("shm-out-size"):
+                shm_out_size = tuple(int(v) for v in opts["shm-out-size"].split("x"))
+            shm_out_slots = int(opts.get("shm-out-slots", SHM_OUT_SLOTS))
+        except ValueError as e:
+            log(f"❌ Bad --shm-out options: {e}")
+            sys.exit(1)
+        shm_out_format = opts.get("shm-out-format", "BGRx")
+        if shm_out_format not in SHM_OUT_FORMATS:
+            log(f"❌ Unknown --shm-out-format {shm_out_format} (use {', '.join(SHM_OUT_FORMATS)}).")
+            sys.exit(1)
+    if opts.get("bench-shm-out"):
+        bench_shm_out(*shm_out_size, shm_out_format, fps)
+        sys.exit(0)
+    if opts.get("bench-damage"):
+        bench_damage(res1, res2, fps)
+        sys.exit(0)
+    if opts.get("bench-replay"):
+        crops, geoms = feed_settings(len(cabinets[0]))
+        bench_replay(cabinets[0], res1, res2, fps, crops, feed_layout, pad_align, geoms, prescale_threads,
+                     scale_method, opts.get("bench-csv", BENCH_CSV))
+        sys.exit(0)
+
+    io_modes = {}
+    capture_formats = {} # for res1 x res2; other sizes (refresh defaults) use MJPEG
+    for dev in filter(is_device, all_devices):
+        io_modes[dev] = choose_io_mode(dev, res1, res2, fps, opts.get("io-mode"), settings, opts.get("reprobe"))
+        capture_formats[dev] = choose_capture_format(dev, res1, res2, fps, io_modes[dev],
+                                                     opts.get("capture-format"), settings, opts.get("reprobe"))
+    if opts.get("record"):
+        os.makedirs(opts["record"], exist_ok=True)
+    if opts.get("stream"):
+        try:
+            stream_kbps = int(opts.get("stream-kbps", STREAM_KBPS))
+            if opts.get("stream-size"):
+                stream_size = tuple(int(v) for v in opts["stream-size"].split("x"))
+            stream_desc(opts["stream"], *stream_size, stream_kbps)
+            stream_url(opts["stream"], 0)
+        except (ValueError, TypeError) as e:
+            log(f"❌ Bad --stream options: {e}")
+            sys.exit(1)
+        scheme = urllib.parse.urlsplit(opts["stream"]).scheme
+        missing = [e for e in ("x264enc", "rtph264pay" if scheme == "udp" else "srtsink")
+                   if not Gst.ElementFactory.find(e)]
+        if missing:
+            log(f"❌ --stream needs {', '.join(missing)} (gstreamer1.0-plugins-ugly / -bad); streaming disabled.")
+            opts.pop("stream")
+        else:
+            log(f"📡 Streaming {stream_size[0]}x{stream_size[1]} H.264 at {stream_kbps} kbit/s to {opts['stream']}")
+    if opts.get("screenshot-format", "png") not in SCREENSHOT_FORMATS:
+        log(f"❌ Unknown screenshot format {opts['screenshot-format']} (use {', '.join(SCREENSHOT_FORMATS)}).")
+        sys.exit(1)
+    if opts.get("tap") and importlib.util.find_spec("numpy") is None:
+        log("❌ --tap needs NumPy (sudo apt install python3-numpy); analytics plugins disabled.")
+        opts.pop("tap")
+    if opts.get("thumbnail"):
+        thumbnail_width = int(opts.get("thumbnail-width", THUMB_WIDTH))
+        thumbnail_every = float(opts.get("thumbnail-every", THUMB_INTERVAL))
+        folder = os.path.dirname(cabinet_path(opts["thumbnail"], "segadoc2in1.jpg"))
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        log(f"🖼️ Thumbnails {thumbnail_width} px wide every {thumbnail_every:g} s (T toggles).")
+    startup.mark("settings + capture probes", t_phase)
+
+    # Launch: one window per cabinet on a shared main loop; a cabinet that fails to start
+    # is logged and skipped so the others still come up.
+    windows = []
+    try:
+        for k, devices in enumerate(cabinets):
+            name = f"cabinet{k + 1}" if len(cabinets) > 1 else ""
+            windows.append((Cabinet if headless else video_window)(devices, name, monitor=k))
+
+        # Pipelines are built and the cards opened on helper threads while GTK maps the windows
+        failed = {}
+        def prepare(win):
+            try:
+                win.prepare()
+            except Exception as ex:
+                failed[win] = ex
+        helpers = [threading.Thread(target=prepare, args=(w,), name=f"prepare-{w.label}") for w in windows]
+        for t in helpers:
+            t.start()
+        if headless:
+            for t in helpers:
+                t.join() # nothing to map meanwhile
+        while any(t.is_alive() for t in helpers):
+            while Gtk.events_pending():
+                Gtk.main_iteration()
+            time.sleep(0.002)
+
+        for win in list(windows):
+            try:
+                if win in failed:
+                    raise failed[win]
+                win.start()
+            except Exception as ex:
+                log(f"❌ {win.name or 'Pipeline'} failed to start: {ex}")
+                windows.remove(win)
+                win.abandon()
+        if not windows:
+            sys.exit(1)
+        if headless:
+            # no window to press ESC in
+            def stop():
+                for w in list(windows):
+                    w.close("Stop signal received")
+                return True
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, stop)
+        if metrics_interval:
+            ui_stats.start_heartbeat()
+        if headless:
+            main_loop = GLib.MainLoop()
+            main_loop.run()
+        else:
+            Gtk.main()
+    except Exception as ex:
+        log(f"❌ Runtime error: {ex}")
+        sys.exit(1)
 
-# Leave values as is so this can reset to default. Next, the operator restarts.
-            pipeline_str = f"""
-            compositor name=comp latency=0 background=transparent ! \
-                gtksink name=vsink \
-            v4l2src device={video_device1} io-mode=2 do-timestamp=true ! \
-                image/jpeg,width=1280,height=720,framerate={fps}/1 ! jpegdec ! \
-                videocrop name=crop1 left=40 right=53 ! \
-                queue max-size-buffers=1 max-size-bytes=0 max-size-time=0 leaky=downstream ! comp.sink_0 \
-            v4l2src device={video_device2} io-mode=2 do-timestamp=true ! \
-                image/jpeg,width=1280,height=720,framerate={fps}/1 ! jpegdec ! \
-                videocrop name=crop2 left=44 right=52 ! \
-                queue max-size-buffers=1 max-size-bytes=0 max-size-time=0 leaky=downstream ! comp.sink_1
-            """
-
-
-            self.pipeline = Gst.parse_launch(pipeline_str)
-            self.vsink = self.pipeline.get_by_name("vsink")
-            self.compositor = self.pipeline.get_by_name("comp")
-            self.crop1 = self.pipeline.get_by_name("crop1")
-            self.crop2 = self.pipeline.get_by_name("crop2")
-
-            # Re-grab pads
-            sinkpads = self.compositor.sinkpads
-            if len(sinkpads) >= 2:
-                self.pad1 = sinkpads[0]
-                self.pad2 = sinkpads[1]
-
-                # Reapply defaults: half-split view
-                half_w = self.base_w // 2
-                self.pad1.set_property("xpos", 0)
-                self.pad1.set_property("ypos", 0)
-                self.pad1.set_property("width", half_w)
-                self.pad1.set_property("height", self.base_h)
-
-                self.pad2.set_property("xpos", half_w)
-                self.pad2.set_property("ypos", 0)
-                self.pad2.set_property("width", self.base_w - half_w)
-                self.pad2.set_property("height", self.base_h)
-
-            # Start pipeline again
-            self.pipeline.set_state(Gst.State.PLAYING)
-            log("✅ Pipeline refreshed successfully.")
-        except Exception as e:
-            log(f"❌ Refresh failed: {e}")
 
-# Launch
-try:
-    win = BorderlessVideoWindow()
-    Gtk.main()
-except Exception as ex:
-    log(f"❌ Runtime error: {ex}")
-    sys.exit(1)
+if __name__ == "__main__":
+    main()
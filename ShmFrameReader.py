@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+###################################################################################
+# Source:
+# https://github.com/DerbyOwnersClub/2in1VideoCard
+#
+#
+# Purpose:
+# Read the composited frames that SEGADOC2in1Video.py --shm-out publishes in shared
+# memory, from another local process (kiosk display, analytics, recorder), without
+# decoding or compositing them again. Frames are used in place in the mapped ring;
+# nothing is copied. No GStreamer needed.
+#
+# Summary:
+# The ring is a file in /dev/shm: a header (size, format, strides) and a few slots, each
+# holding one frame with its sequence number, pts and the CLOCK_MONOTONIC time it was
+# published. A slot's sequence number is 0 while the writer fills it, so a reader checks
+# it again after using the frame: if it changed, the frame was overwritten meanwhile.
+#
+# Requirements:
+# Python 3 on the machine running SEGADOC2in1Video.py --shm-out
+#
+#
+#----------------------------------------------------------------------------------------------------------------------------------
+# Date         | Author                            			                                       | Description
+#----------------------------------------------------------------------------------------------------------------------------------
+#
+#
+#----------------------------------------------------------------------------------------------------------------------------------
+#
+# Usage:
+# python3 ShmFrameReader.py [PATH]                   print the ring format, then one line per second with fps,
+#                                                     missed frames and publish-to-read latency
+# python3 ShmFrameReader.py [PATH] --bench[=seconds] read every frame for 10 s (default) and print throughput,
+#                                                     missed and torn frames and latency percentiles
+# PATH defaults to /dev/shm/segadoc2in1-out (with --cabinets: /dev/shm/segadoc2in1-out-cabinetN)
+#
+# From Python:
+#   from ShmFrameReader import ShmFrameReader
+#   ring = ShmFrameReader()
+#   for meta, data in ring.frames():
+#       ...                         # data is a memoryview over the slot, valid until ring.intact(meta)
+#                                   # turns False; copy what has to be kept
+#
+###################################################################################
+
+import mmap
+import os
+import struct
+import sys
+import time
+
+DEFAULT_PATH = "/dev/shm/segadoc2in1-out"
+POLL_INTERVAL = 0.001 # seconds between checks for a new frame
+REOPEN_AFTER = 2      # seconds without a new frame before checking whether the writer restarted
+
+# Ring layout, as written by ShmRingWriter in SEGADOC2in1Video.py
+RING_MAGIC = b"SDOCRNG1"
+RING_HEADER = struct.Struct("<8sIIIIII16sI4I4I") # magic, version, header size, slots, slot size,
+                                                 # width, height, format, frame size, strides, offsets
+RING_LATEST = 128 # u64: sequence number of the newest complete frame
+SLOT = struct.Struct("<QQQI") # seq (0 while written), pts ns, CLOCK_MONOTONIC ns when published, bytes
+SLOT_DATA = 64
+
+# ---------------- Reader ---------------- #
+
+class ShmFrameReader:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.mm = None
+        self.open()
+
+    def open(self):
+        # an older mapping stays valid until the frames handed out from it are gone
+        with open(self.path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.mm = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+        (magic, version, self.data_offset, self.slots, self.slot_size, self.width, self.height, fmt,
+         self.frame_size, *layout) = RING_HEADER.unpack_from(self.mm, 0)
+        if magic != RING_MAGIC:
+            raise ValueError(f"{self.path} is not a SEGADOC2in1Video.py frame ring")
+        self.format = fmt.rstrip(b"\0").decode()
+        self.strides, self.offsets = layout[:4], layout[4:]
+        self.view = memoryview(self.mm)
+
+    def restarted(self):
+        # the writer makes a new file when it starts again
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except OSError:
+            return False
+
+    def latest(self):
+        return struct.unpack_from("<Q", self.mm, RING_LATEST)[0]
+
+    def frame(self, seq):
+        # (meta, memoryview of the frame) for frame `seq`, or None when it is no longer (or not yet) there
+        off = self.data_offset + (seq % self.slots) * self.slot_size
+        slot_seq, pts, published_ns, size = SLOT.unpack_from(self.mm, off)
+        if slot_seq != seq:
+            return None
+        meta = {"seq": seq, "pts": pts, "published_ns": published_ns, "size": size, "slot": off}
+        return meta, self.view[off + SLOT_DATA:off + SLOT_DATA + size]
+
+    def intact(self, meta):
+        # True while the writer has not started to overwrite the frame
+        return SLOT.unpack_from(self.mm, meta["slot"])[0] == meta["seq"]
+
+    def frames(self, timeout=None):
+        # newest frames as they are published; a reader that falls behind skips to the newest
+        last, idle_since = self.latest(), time.monotonic()
+        while True:
+            seq = self.latest()
+            if seq == last:
+                if timeout is not None and time.monotonic() - idle_since > timeout:
+                    return
+                if time.monotonic() - idle_since > REOPEN_AFTER and self.restarted():
+                    self.open()
+                    last = 0
+                time.sleep(POLL_INTERVAL)
+                continue
+            idle_since = time.monotonic()
+            got = self.frame(seq)
+            if got:
+                got[0]["missed"] = max(0, seq - last - 1) if last else 0
+                yield got
+            last = seq
+
+    def describe(self):
+        return (f"{self.path}: {self.width}x{self.height} {self.format}, {self.frame_size} bytes/frame, "
+                f"{self.slots} slots, strides {self.strides[:self._planes()]}, offsets {self.offsets[:self._planes()]}")
+
+    def _planes(self):
+        return max(1, sum(1 for s in self.strides if s))
+
+# ---------------- Commands ---------------- #
+
+def watch(ring):
+    frames = missed = 0
+    latency = []
+    since = time.monotonic()
+    for meta, data in ring.frames():
+        frames += 1
+        missed += meta["missed"]
+        latency.append((time.monotonic_ns() - meta["published_ns"]) / 1e6)
+        now = time.monotonic()
+        if now - since >= 1:
+            print(f"seq {meta['seq']}: {frames / (now - since):.1f} fps, {missed} missed, "
+                  f"latency avg {sum(latency) / len(latency):.2f} ms, max {max(latency):.2f} ms", flush=True)
+            frames = missed = 0
+            latency = []
+            since = now
+
+def bench(ring, seconds):
+    # Touches one byte per page of every frame in place, as a consumer reading it would,
+    # and checks the slot was not overwritten meanwhile.
+    frames = missed = torn = 0
+    latency = []
+    t0, cpu0 = time.monotonic(), time.process_time()
+    for meta, data in ring.frames(timeout=REOPEN_AFTER):
+        latency.append((time.monotonic_ns() - meta["published_ns"]) / 1e6)
+        sum(data[::mmap.PAGESIZE])
+        if not ring.intact(meta):
+            torn += 1
+        frames += 1
+        missed += meta["missed"]
+        if time.monotonic() - t0 >= seconds:
+            break
+    wall, cpu = time.monotonic() - t0, time.process_time() - cpu0
+    if not frames:
+        print("No frames published (is SEGADOC2in1Video.py --shm-out running?)")
+        return
+    latency.sort()
+    print(f"{frames} frames in {wall:.1f} s: {frames / wall:.1f} fps, {frames * ring.frame_size / wall / 1e6:.0f} MB/s "
+          f"read in place, {missed} missed, {torn} torn")
+    print(f"publish to read: p50 {latency[len(latency) // 2]:.2f} ms, "
+          f"p95 {latency[min(len(latency) - 1, int(0.95 * len(latency)))]:.2f} ms, max {latency[-1]:.2f} ms; "
+          f"reader CPU {1000.0 * cpu / frames:.3f} ms/frame")
+
+# ---------------- Main ---------------- #
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    try:
+        ring = ShmFrameReader(args[0] if args else DEFAULT_PATH)
+    except (OSError, ValueError) as e:
+        print(f"Cannot open the ring: {e}")
+        sys.exit(1)
+    print(ring.describe())
+    try:
+        if "bench" in opts:
+            bench(ring, float(opts["bench"] or 10))
+        else:
+            watch(ring)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
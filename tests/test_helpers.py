@@ -0,0 +1,83 @@
+import pytest
+
+import SEGADOC2in1Video as video # the helpers need neither GStreamer nor a display
+import ShmFrameReader as reader
+
+
+def test_grid_geometry():
+    assert video.grid_geometry(3, 1280, 720, 2) == [(0, 0, 640, 360), (640, 0, 640, 360), (0, 360, 640, 360)]
+    assert video.grid_geometry(2, 1000, 720, 2, align=64) == [(0, 0, 448, 720), (448, 0, 512, 720)]
+
+
+def test_layout_geometry():
+    assert video.layout_geometry(2, 1280, 720) == [(0, 0, 640, 720), (640, 0, 640, 720)]
+    assert video.layout_geometry(4, 1280, 720) == [(0, 0, 640, 360), (640, 0, 640, 360),
+                                                   (0, 360, 640, 360), (640, 360, 640, 360)]
+    assert video.layout_geometry(3, 1200, 600, "row") == [(0, 0, 400, 600), (400, 0, 400, 600), (800, 0, 400, 600)]
+    # aligned widths and xpos; the spare columns stay background
+    assert video.layout_geometry(2, 1000, 720, align=64) == [(0, 0, 448, 720), (448, 0, 512, 720)]
+    assert video.layout_geometry(2, 1280, 720, overrides={1: (0.5, 0, 0.5, 0.5)})[1] == (640, 0, 640, 360)
+
+
+def test_parse_affinity():
+    assert video.parse_affinity("feed1:1,feed2:2,comp:2-3") == {"feed1": {1}, "feed2": {2}, "comp": {2, 3}}
+    assert video.parse_affinity("") == {}
+
+
+def test_thread_role():
+    assert video.thread_role("dec2") == "feed2"
+    assert video.thread_role("q1") == "feed1"
+    assert video.thread_role("comp") == "comp"
+    assert video.thread_role("outtee") is None
+    assert video.thread_role(None) is None
+
+
+def test_feed_spec():
+    assert video.feed_spec("video0") == "/dev/video0"
+    assert video.feed_spec("v4l2://video2") == "/dev/video2"
+    assert video.feed_spec("v4l2:///dev/video3") == "/dev/video3"
+    assert video.feed_spec("test://ball?kb=250") == "test://ball?kb=250"
+
+
+def test_stream_url():
+    assert video.stream_url("udp://10.0.0.5:5000", 0) == "udp://10.0.0.5:5000"
+    assert video.stream_url("srt://10.0.0.5:7000?mode=caller", 2) == "srt://10.0.0.5:7002?mode=caller"
+
+
+def test_cabinet_path():
+    assert video.cabinet_path(True, "segadoc2in1.jpg") == "/dev/shm/segadoc2in1.jpg"
+    assert video.cabinet_path(True, "segadoc2in1.jpg", "cab2") == "/dev/shm/segadoc2in1-cab2.jpg"
+    assert video.cabinet_path("/tmp/thumb.jpg", "segadoc2in1.jpg") == "/tmp/thumb.jpg"
+
+
+def test_feed_settings(monkeypatch):
+    monkeypatch.setattr(video, "opts", {"crop1": "10,20", "crop2": "1,2,3,4", "geom2": "0.5,0,0.5,0.5"})
+    crops, geoms = video.feed_settings(2)
+    assert crops == [(10, 20, 0, 0), (1, 2, 3, 4)]
+    assert geoms == {1: (0.5, 0.0, 0.5, 0.5)}
+    for bad in ({"crop1": "10"}, {"crop1": "1,2,3"}, {"crop1": "a,b"}, {"geom1": "0,0,1"}):
+        monkeypatch.setattr(video, "opts", bad)
+        with pytest.raises(ValueError):
+            video.feed_settings(2)
+
+
+def test_replay_ring_keeps_the_newest_frames_within_max_bytes():
+    ring = video.ReplayRing(seconds=60, max_bytes=10)
+    for data in (b"aaaa", b"bbbb", b"cccc", b"dddd"):
+        ring.add(data, 0.0)
+    assert [data for _, data in ring.snapshot()] == [b"cccc", b"dddd"]
+    assert ring.bytes == 8
+
+
+def test_replay_ring_keeps_the_last_seconds():
+    ring = video.ReplayRing(seconds=2, max_bytes=1000)
+    for now in range(5):
+        ring.add(b"x", float(now))
+    assert [at for at, _ in ring.snapshot()] == [2.0, 3.0, 4.0]
+
+
+def test_ring_layout_is_shared_with_the_reader():
+    assert video.SHM_RING_MAGIC == reader.RING_MAGIC
+    assert video.SHM_RING_HEADER.format == reader.RING_HEADER.format
+    assert video.SHM_SLOT.format == reader.SLOT.format
+    assert (video.SHM_RING_LATEST, video.SHM_SLOT_DATA) == (reader.RING_LATEST, reader.SLOT_DATA)
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("gi")
+import SEGADOC2in1Video as video
+
+if video.Gst is None:
+    pytest.skip("needs the GStreamer typelibs", allow_module_level=True)
+video.Gst.init(None)
+
+import ShmFrameReader as reader
+
+
+def test_ring_writer_to_reader(tmp_path):
+    path = str(tmp_path / "ring")
+    writer = video.ShmRingWriter(path, video.shm_out_caps(64, 32, "BGRx"), slots=3)
+    try:
+        frames = [bytes([n]) * (64 * 32 * 4) for n in (1, 2)]
+        for data in frames:
+            writer._publish(video.Gst.Buffer.new_wrapped(data))
+        ring = reader.ShmFrameReader(path)
+        assert (ring.width, ring.height, ring.format, ring.strides[0]) == (64, 32, "BGRx", 256)
+        assert ring.latest() == 2
+        for seq, data in enumerate(frames, 1):
+            meta, view = ring.frame(seq)
+            assert bytes(view) == data and ring.intact(meta)
+    finally:
+        writer.close()
+
+
+def test_prescale_fills_the_box():
+    # a 1827x1080 feed into a 640x720 box: stretched like the compositor does, not letterboxed
+    if not video.prescale_supported():
+        pytest.skip("videoscale has no n-threads")
+    pipeline = video.Gst.parse_launch(
+        "videotestsrc pattern=white num-buffers=1 ! video/x-raw,format=GRAY8,width=1827,height=1080 ! "
+        + video.prescale_desc(1, 640, 720, 2) + "videoconvert ! video/x-raw,format=GRAY8 ! appsink name=out")
+    pipeline.set_state(video.Gst.State.PLAYING)
+    sample = pipeline.get_by_name("out").emit("try-pull-sample", 5 * video.Gst.SECOND)
+    pipeline.set_state(video.Gst.State.NULL)
+    buf = sample.get_buffer()
+    data = buf.extract_dup(0, buf.get_size())
+    stride = len(data) // 720
+    assert min(data[0:640]) > 200 and min(data[719 * stride:719 * stride + 640]) > 200 # first and last rows
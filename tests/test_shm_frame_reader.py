@@ -0,0 +1,60 @@
+import struct
+
+import ShmFrameReader as reader
+
+
+def write_ring(path, width=4, height=2, slots=3, frames=()):
+    # a ring as ShmRingWriter lays it out: BGRx, one plane
+    stride, size = width * 4, width * height * 4
+    slot_size = reader.SLOT_DATA + -(-size // 64) * 64
+    data = bytearray(192 + slots * slot_size)
+    reader.RING_HEADER.pack_into(data, 0, reader.RING_MAGIC, 1, 192, slots, slot_size, width, height,
+                                 b"BGRx", size, stride, 0, 0, 0, 0, 0, 0, 0)
+    for seq, payload in frames:
+        off = 192 + (seq % slots) * slot_size
+        reader.SLOT.pack_into(data, off, seq, seq * 1000, 0, len(payload))
+        data[off + reader.SLOT_DATA:off + reader.SLOT_DATA + len(payload)] = payload
+        struct.pack_into("<Q", data, reader.RING_LATEST, seq)
+    path.write_bytes(bytes(data))
+    return slot_size
+
+
+def test_header(tmp_path):
+    write_ring(tmp_path / "ring")
+    ring = reader.ShmFrameReader(str(tmp_path / "ring"))
+    assert (ring.width, ring.height, ring.format, ring.slots) == (4, 2, "BGRx", 3)
+    assert ring.frame_size == 32 and ring.strides[0] == 16
+    assert ring.latest() == 0
+
+
+def test_frames_in_place(tmp_path):
+    write_ring(tmp_path / "ring", frames=[(4, b"a" * 32), (5, b"b" * 32)])
+    ring = reader.ShmFrameReader(str(tmp_path / "ring"))
+    assert ring.latest() == 5
+    meta, data = ring.frame(5)
+    assert (meta["seq"], meta["pts"], bytes(data)) == (5, 5000, b"b" * 32)
+    assert ring.intact(meta)
+    assert ring.frame(2) is None # its slot holds seq 5 now
+    assert bytes(ring.frame(4)[1]) == b"a" * 32
+
+
+def test_overwritten_frame_is_not_intact(tmp_path):
+    path = tmp_path / "ring"
+    slot_size = write_ring(path, frames=[(1, b"x" * 32)])
+    ring = reader.ShmFrameReader(str(path))
+    meta, _ = ring.frame(1)
+    # the writer zeroes a slot's seq before it copies a new frame in
+    with open(path, "r+b") as f:
+        f.seek(192 + 1 * slot_size)
+        f.write(struct.pack("<Q", 0))
+    assert not ring.intact(meta)
+    assert ring.frame(1) is None
+
+
+def test_not_a_ring(tmp_path):
+    (tmp_path / "junk").write_bytes(b"\0" * 256)
+    try:
+        reader.ShmFrameReader(str(tmp_path / "junk"))
+    except ValueError:
+        return
+    assert False, "accepted a file without the ring magic"